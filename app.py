@@ -1,12 +1,15 @@
 # Home.py
+import math
 import streamlit as st
 import pandas as pd
 import requests
 
+from client import QuizClient, QuizClientError, get_questions_params
 from utils import (
     check_upload_requirements,
     get_all_questions_df,
-    get_DataFrame_from_Excel,
+    get_bank_snapshot,
+    get_questions_preview_df,
     save_all_questions_df,
     update_correct_box_options,
 )
@@ -20,8 +23,12 @@ st.set_page_config(
 # Title
 st.title(f"MAY25 BMLOPS // FastAPI")
 
-questions_df = get_DataFrame_from_Excel()
-questions_count_db = questions_df.shape[0]
+# Cached per bank version, so reruns don't re-read the Excel file
+bank_snapshot = get_bank_snapshot()
+questions_count_db = bank_snapshot["questions_df"].shape[0]
+
+# Number of questions per page of the admin preview
+PREVIEW_PAGE_SIZE = 25
 
 api_error = False
 login_type = None
@@ -31,17 +38,21 @@ upload_requirements = False
 if "correct_box_options" not in st.session_state:
     st.session_state.correct_box_options = ["None"]
 
+# One API client per session, so pooled connections and cached responses survive reruns
+if "quiz_client" not in st.session_state:
+    st.session_state.quiz_client = QuizClient()
+
+quiz_client = st.session_state.quiz_client
+
 # Fetching test types and categories from the FastAPI server
 try:
-    categories = requests.get("https://fastapi-j6h5.onrender.com/categories").json()
+    categories = quiz_client.categories()
     categories_ui = ["All"] + categories
 
-    test_types = requests.get("https://fastapi-j6h5.onrender.com/test_types").json()
+    test_types = quiz_client.test_types()
     test_types_ui = ["All"] + test_types
 
-    registered_users = requests.get(
-        "https://fastapi-j6h5.onrender.com/registered_users"
-    ).json()
+    registered_users = quiz_client.registered_users()
 
 except requests.exceptions.RequestException:
     st.error(f"The FastAPI server is not running or not reachable.", icon="🚨")
@@ -78,18 +89,14 @@ if api_error == False:
             )
 
     # Authentication check
-    # Create headers dictionary for authentication
-    auth_headers = {
-        "X-Username": user_name,
-        "X-Password": password,
-    }
+    # Log in only when the credentials change, afterwards the client sends the
+    # session token instead of the password
+    if st.session_state.get("login_credentials") != (user_name, password):
+        quiz_client.set_credentials(user_name, password)
+        st.session_state.login_type = quiz_client.check_login()
+        st.session_state.login_credentials = (user_name, password)
 
-    # Send request with headers
-    response = requests.get(
-        "https://fastapi-j6h5.onrender.com/check_user_login", headers=auth_headers
-    )
-
-    login_type = response.json()
+    login_type = st.session_state.login_type
 
     if login_type == "no_login_info":
         st.info("**Login info needed:** Please enter your credentials.", icon="ℹ️")
@@ -139,16 +146,20 @@ if api_error == False:
                     help="Select the number of random questions you want to see. **Note:** If the selected number is larger than the available questions, questions will be resampled.",
                 )
 
-        # Prepare the query string for the API request
-        test_type_str = use_box.replace(" ", "+")
+        # Prepare the query parameters for the API request
+        test_type_str = use_box
         test_categories_str = ",".join(subject_box)
         question_count_str = number_radio
 
-        query_string = f"https://fastapi-j6h5.onrender.com/questions?use={test_type_str}{'&subject=' + f'{test_categories_str}' if subject_box != [] else ''}&question_count={question_count_str}"
+        questions_params = get_questions_params(
+            subject=subject_box, use=use_box, question_count=number_radio
+        )
+        query_string = quiz_client.url("/questions", questions_params)
 
         # Get the DataFrame from the API
-        questions_json = requests.get(query_string)
-        questions_dict = questions_json.json()["questions"]
+        questions_dict = quiz_client.questions(
+            subject=subject_box, use=use_box, question_count=number_radio
+        )
         questions_df = pd.DataFrame(questions_dict)
 
         # Rename and shift the index
@@ -177,7 +188,7 @@ if api_error == False:
         ):
             st.code(query_string)
 
-        if user_name == "admin" and password == "4dm1n":
+        if login_type == "admin":
 
             with st.expander(
                 label="**Admin feature #1:** Add new question", expanded=True
@@ -334,21 +345,11 @@ if api_error == False:
                     ):
 
                         # Send the new question to the FastAPI server
-                        # Create headers dictionary for authentication
-                        auth_headers = {
-                            "X-Username": user_name,
-                            "X-Password": password,
-                        }
-
-                        # Send request with headers instead of parameters
-                        response = requests.post(
-                            "https://fastapi-j6h5.onrender.com/add_question",
-                            headers=auth_headers,
-                            json=new_question_dict,
-                        )
-
-                        response_data = response.json()
-                        st.toast(response_data, icon="✅")
+                        try:
+                            response_data = quiz_client.add_question(new_question_dict)
+                            st.toast(response_data, icon="✅")
+                        except QuizClientError as error:
+                            st.toast(str(error), icon="🚨")
 
             with st.expander(
                 label="**Admin feature #2:** Show new DataFrame with all questions _(if applicable)_",
@@ -357,8 +358,24 @@ if api_error == False:
                 if upload_requirements == False:
                     st.info("Please enter required fields of new question", icon="ℹ️")
                 else:
-                    all_questions_df = get_all_questions_df(new_question_dict)
-                    st.dataframe(all_questions_df)
+                    preview_page_count = math.ceil(
+                        (questions_count_db + 1) / PREVIEW_PAGE_SIZE
+                    )
+                    preview_page = st.number_input(
+                        label=f"**Page** (of {preview_page_count})",
+                        min_value=1,
+                        max_value=preview_page_count,
+                        value=1,
+                        step=1,
+                        help="Select the page of the DataFrame to show.",
+                    )
+                    preview_df = get_questions_preview_df(
+                        bank_snapshot,
+                        new_question_dict,
+                        page=preview_page,
+                        page_size=PREVIEW_PAGE_SIZE,
+                    )
+                    st.dataframe(preview_df)
 
             with st.expander(
                 label="**Admin feature #3:** Save DataFrame with all questions",
@@ -378,4 +395,6 @@ if api_error == False:
                         use_container_width=True,
                         help="Click to save the DataFrame with all questions to an Excel file",
                     ):
+                        # Build the full DataFrame only when saving
+                        all_questions_df = get_all_questions_df(new_question_dict)
                         save_all_questions_df(all_questions_df)
@@ -0,0 +1,497 @@
+import asyncio
+import aiohttp
+import requests
+import time
+
+from typing import Dict, List, Optional, TypedDict, Union
+from urllib.parse import urlencode
+
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+# Base URL of the deployed FastAPI server
+DEFAULT_BASE_URL = "https://fastapi-j6h5.onrender.com"
+
+# Status codes worth retrying: the server is restarting or overloaded
+RETRY_STATUS_CODES = (502, 503, 504)
+
+# Session tokens are refreshed when they expire within this many seconds
+TOKEN_REFRESH_MARGIN = 60
+
+
+class Question(TypedDict):
+    question: str
+    subject: str
+    use: str
+    correct: Optional[str]
+    responseA: Optional[str]
+    responseB: Optional[str]
+    responseC: Optional[str]
+    responseD: Optional[str]
+    remark: Optional[str]
+
+
+class QuizClientError(Exception):
+    """
+    Raised when the server answers a request with {"status": "error", ...}.
+    """
+
+
+def get_questions_params(
+    subject: Union[str, List[str]] = "All",
+    use: str = "All",
+    question_count: Union[int, str] = "All",
+    strategy: str = "uniform",
+    weights: Optional[Dict[str, float]] = None,
+    bank: Optional[str] = None,
+) -> Dict[str, str]:
+    """
+    Builds the query parameters of the "questions" route.
+
+    Args:
+        subject (str | List[str]): One or several categories (default is "All").
+        use (str): The test type (default is "All").
+        question_count (int | str): The number of random questions (default is "All").
+        strategy (str): "uniform", "stratified" or "proportional" (default is "uniform").
+        weights (Dict[str, float]): Optional weight per category.
+        bank (str): Optional question bank, the server's default bank if None.
+
+    Returns:
+        Dict[str, str]: Query parameters.
+    """
+    if isinstance(subject, list):
+        subject = ",".join(subject) if subject else "All"
+
+    params = {"subject": subject, "use": use, "question_count": str(question_count)}
+
+    if strategy != "uniform":
+        params["strategy"] = strategy
+    if weights:
+        params["weights"] = ",".join(f"{key}:{value}" for key, value in weights.items())
+    if bank:
+        params["bank"] = bank
+
+    return params
+
+
+def get_bank_params(bank: Optional[str]) -> Optional[Dict[str, str]]:
+    """
+    Returns the query parameters selecting a question bank, or None for the default bank.
+    """
+    return {"bank": bank} if bank else None
+
+
+def is_unauthorized(data) -> bool:
+    """
+    Checks if the response data is the server's error message for missing authorization.
+    """
+    return (
+        isinstance(data, dict)
+        and data.get("status") == "error"
+        and str(data.get("message", "")).startswith("Unauthorized")
+    )
+
+
+def check_response_data(data):
+    """
+    Raises QuizClientError if the response data is an error message of the server.
+    """
+    if isinstance(data, dict) and data.get("status") == "error":
+        raise QuizClientError(data.get("message", "Unknown error"))
+
+    return data
+
+
+class QuizClient:
+    """
+    Synchronous client for the FastAPI quiz server.
+
+    Connections are kept alive in a pool, GET requests are retried with backoff on
+    connection errors and 502/503/504, and "categories"/"test_types" are cached
+    locally and revalidated with their ETag. After check_login, requests carry the
+    session token instead of the password; it is refreshed before it expires, and
+    the client logs in again once if the server rejects it.
+    """
+
+    def __init__(
+        self,
+        base_url: str = DEFAULT_BASE_URL,
+        user_name: str = "",
+        password: str = "",
+        timeout: float = 10.0,
+        max_retries: int = 3,
+        pool_size: int = 10,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self._etag_cache: Dict[str, tuple] = {}
+
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=0.3,
+            status_forcelist=RETRY_STATUS_CODES,
+            allowed_methods={"GET"},
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry
+        )
+
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.token_expires_at = 0
+        self.set_credentials(user_name, password)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self) -> None:
+        self.session.close()
+
+    def set_credentials(self, user_name: str, password: str) -> None:
+        """
+        Sets the credentials sent with every request until check_login gets a session token.
+        """
+        self.credentials = {"X-Username": user_name, "X-Password": password}
+        self._set_token(None, 0)
+
+    def _set_token(self, token: Optional[str], expires_at: int) -> None:
+        self.token_expires_at = expires_at
+
+        if token:
+            self.session.headers.pop("X-Username", None)
+            self.session.headers.pop("X-Password", None)
+            self.session.headers["Authorization"] = f"Bearer {token}"
+        else:
+            self.session.headers.pop("Authorization", None)
+            self.session.headers.update(self.credentials)
+
+    def _ensure_token(self) -> None:
+        """
+        Refreshes the session token if it expires soon, or logs in again if it expired.
+        """
+        if not self.token_expires_at:
+            return
+
+        if time.time() > self.token_expires_at - TOKEN_REFRESH_MARGIN:
+            if time.time() < self.token_expires_at:
+                response = self.session.post(
+                    self.url("/refresh_token"), timeout=self.timeout
+                )
+                data = response.json() if response.ok else {}
+
+                if data.get("status") == "success":
+                    self._set_token(data["token"], data["expires_at"])
+                    return
+
+            self.check_login()
+
+    def url(self, path: str, params: Optional[Dict[str, str]] = None) -> str:
+        """
+        Returns the full URL of a route, with its query string if params are given.
+        """
+        return f"{self.base_url}{path}" + (f"?{urlencode(params)}" if params else "")
+
+    def _send(self, method: str, path: str, **kwargs):
+        response = self.session.request(
+            method, self.url(path), timeout=self.timeout, **kwargs
+        )
+        response.raise_for_status()
+
+        return response.json()
+
+    def _request(self, method: str, path: str, **kwargs):
+        self._ensure_token()
+        data = self._send(method, path, **kwargs)
+
+        # The token may be rejected early, e.g. after a server restart with a new secret
+        if (
+            is_unauthorized(data)
+            and self.token_expires_at
+            and self.credentials["X-Password"]
+        ):
+            self.check_login()
+            data = self._send(method, path, **kwargs)
+
+        return check_response_data(data)
+
+    def _get_cached(self, path: str, params: Optional[Dict[str, str]] = None):
+        self._ensure_token()
+        url = self.url(path, params)
+        etag, data = self._etag_cache.get(url, (None, None))
+        headers = {"If-None-Match": etag} if etag else {}
+
+        response = self.session.get(url, headers=headers, timeout=self.timeout)
+
+        if response.status_code == 304:
+            return data
+
+        response.raise_for_status()
+        data = response.json()
+
+        if "ETag" in response.headers:
+            self._etag_cache[url] = (response.headers["ETag"], data)
+
+        return data
+
+    def categories(self, bank: Optional[str] = None) -> List[str]:
+        return self._get_cached("/categories", get_bank_params(bank))
+
+    def test_types(self, bank: Optional[str] = None) -> List[str]:
+        return self._get_cached("/test_types", get_bank_params(bank))
+
+    def banks(self) -> dict:
+        return self._request("GET", "/banks")
+
+    def registered_users(self) -> Dict[str, str]:
+        return self._request("GET", "/registered_users")
+
+    def check_login(self) -> str:
+        """
+        Returns "admin", "user", "no_login_info" or "login_failed" for the client's credentials
+        and keeps the session token issued on success.
+        """
+        self._set_token(None, 0)
+        response = self.session.get(self.url("/check_user_login"), timeout=self.timeout)
+        response.raise_for_status()
+
+        if "X-Session-Token" in response.headers:
+            self._set_token(
+                response.headers["X-Session-Token"],
+                int(response.headers["X-Session-Expires"]),
+            )
+
+        return response.json()
+
+    def questions(self, **params) -> List[Question]:
+        """
+        Returns questions of the "questions" route, see get_questions_params for the arguments.
+        """
+        data = self._request("GET", "/questions", params=get_questions_params(**params))
+
+        return data["questions"]
+
+    def quizzes(self, quiz_params: List[dict]) -> List[List[Question]]:
+        """
+        Returns one list of questions per entry of quiz_params, reusing pooled connections.
+        """
+        return [self.questions(**params) for params in quiz_params]
+
+    def grade(self, submissions: List[dict], bank: Optional[str] = None) -> dict:
+        return self._request(
+            "POST",
+            "/grade",
+            params=get_bank_params(bank),
+            json={"submissions": submissions},
+        )
+
+    def add_question(self, new_question_dict: dict) -> dict:
+        return self._request("POST", "/add_question", json=new_question_dict)
+
+
+class AsyncQuizClient:
+    """
+    Asynchronous client for the FastAPI quiz server, with the same interface as
+    QuizClient. Use it as "async with AsyncQuizClient() as client:".
+    """
+
+    def __init__(
+        self,
+        base_url: str = DEFAULT_BASE_URL,
+        user_name: str = "",
+        password: str = "",
+        timeout: float = 10.0,
+        max_retries: int = 3,
+        pool_size: int = 10,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.pool_size = pool_size
+        self.session: Optional[aiohttp.ClientSession] = None
+        self._etag_cache: Dict[str, tuple] = {}
+        self._token_lock = asyncio.Lock()
+        self.token_expires_at = 0
+        self.set_credentials(user_name, password)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self) -> None:
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    def set_credentials(self, user_name: str, password: str) -> None:
+        self.credentials = {"X-Username": user_name, "X-Password": password}
+        self._set_token(None, 0)
+
+    def _set_token(self, token: Optional[str], expires_at: int) -> None:
+        self.token_expires_at = expires_at
+        self.headers = (
+            {"Authorization": f"Bearer {token}"} if token else dict(self.credentials)
+        )
+
+    def _token_expires_soon(self) -> bool:
+        return bool(self.token_expires_at) and (
+            time.time() > self.token_expires_at - TOKEN_REFRESH_MARGIN
+        )
+
+    async def _ensure_token(self) -> None:
+        if not self._token_expires_soon():
+            return
+
+        # Concurrent requests (e.g. of quizzes) refresh the token only once, the
+        # server revokes the old token on refresh
+        async with self._token_lock:
+            if not self._token_expires_soon():
+                return
+
+            if time.time() < self.token_expires_at:
+                try:
+                    _, _, data = await self._send(
+                        "POST", "/refresh_token", self.headers
+                    )
+                except aiohttp.ClientError:
+                    data = {}
+
+                if data.get("status") == "success":
+                    self._set_token(data["token"], data["expires_at"])
+                    return
+
+            await self.check_login()
+
+    def url(self, path: str, params: Optional[Dict[str, str]] = None) -> str:
+        return f"{self.base_url}{path}" + (f"?{urlencode(params)}" if params else "")
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        # The session has to be created inside a running event loop
+        if self.session is None:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+
+        return self.session
+
+    async def _send(self, method: str, path: str, headers: dict, **kwargs):
+        """
+        Sends a request and returns (status, headers, data). GET requests are retried
+        with backoff on connection errors and 502/503/504.
+        """
+        attempts = self.max_retries + 1 if method == "GET" else 1
+
+        for attempt in range(attempts):
+            try:
+                async with self._get_session().request(
+                    method, self.url(path), headers=headers, **kwargs
+                ) as response:
+                    if response.status in RETRY_STATUS_CODES and attempt < attempts - 1:
+                        raise aiohttp.ClientResponseError(
+                            response.request_info, (), status=response.status
+                        )
+
+                    response.raise_for_status()
+                    data = await response.json() if response.status != 304 else None
+
+                    return response.status, response.headers, data
+
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if attempt == attempts - 1:
+                    raise
+
+            except aiohttp.ClientResponseError as error:
+                if error.status not in RETRY_STATUS_CODES or attempt == attempts - 1:
+                    raise
+
+            await asyncio.sleep(0.3 * 2**attempt)
+
+    async def _request(self, method: str, path: str, **kwargs):
+        await self._ensure_token()
+        _, _, data = await self._send(method, path, self.headers, **kwargs)
+
+        # The token may be rejected early, e.g. after a server restart with a new secret
+        if (
+            is_unauthorized(data)
+            and self.token_expires_at
+            and self.credentials["X-Password"]
+        ):
+            await self.check_login()
+            _, _, data = await self._send(method, path, self.headers, **kwargs)
+
+        return check_response_data(data)
+
+    async def _get_cached(self, path: str, params: Optional[Dict[str, str]] = None):
+        await self._ensure_token()
+        cache_key = self.url(path, params)
+        etag, data = self._etag_cache.get(cache_key, (None, None))
+        headers = {**self.headers, **({"If-None-Match": etag} if etag else {})}
+
+        status, response_headers, response_data = await self._send(
+            "GET", path, headers, params=params
+        )
+
+        if status == 304:
+            return data
+
+        if "ETag" in response_headers:
+            self._etag_cache[cache_key] = (response_headers["ETag"], response_data)
+
+        return response_data
+
+    async def categories(self, bank: Optional[str] = None) -> List[str]:
+        return await self._get_cached("/categories", get_bank_params(bank))
+
+    async def test_types(self, bank: Optional[str] = None) -> List[str]:
+        return await self._get_cached("/test_types", get_bank_params(bank))
+
+    async def banks(self) -> dict:
+        return await self._request("GET", "/banks")
+
+    async def registered_users(self) -> Dict[str, str]:
+        return await self._request("GET", "/registered_users")
+
+    async def check_login(self) -> str:
+        self._set_token(None, 0)
+        _, headers, data = await self._send("GET", "/check_user_login", self.headers)
+
+        if "X-Session-Token" in headers:
+            self._set_token(
+                headers["X-Session-Token"], int(headers["X-Session-Expires"])
+            )
+
+        return data
+
+    async def questions(self, **params) -> List[Question]:
+        data = await self._request(
+            "GET", "/questions", params=get_questions_params(**params)
+        )
+
+        return data["questions"]
+
+    async def quizzes(self, quiz_params: List[dict]) -> List[List[Question]]:
+        """
+        Returns one list of questions per entry of quiz_params, fetched concurrently.
+        """
+        return await asyncio.gather(
+            *(self.questions(**params) for params in quiz_params)
+        )
+
+    async def grade(self, submissions: List[dict], bank: Optional[str] = None) -> dict:
+        return await self._request(
+            "POST",
+            "/grade",
+            params=get_bank_params(bank),
+            json={"submissions": submissions},
+        )
+
+    async def add_question(self, new_question_dict: dict) -> dict:
+        return await self._request("POST", "/add_question", json=new_question_dict)
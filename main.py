@@ -1,35 +1,138 @@
+import asyncio
+import hashlib
+import logging
+import math
+import time
 import pandas as pd
 import numpy as np
 
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, Request
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, JSONResponse, Response
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
 
 from utils import (
+    bank_registry,
     check_streamlit_status,
+    create_session_token,
+    DEFAULT_BANK,
+    EXPORT_FORMATS,
+    SESSION_MAX_AGE,
+    SESSION_SECRET_FROM_ENV,
+    get_answer_key,
+    get_bank_snapshot,
+    get_bearer_token,
     get_button_config,
-    get_DataFrame_from_Excel,
+    get_export_payload,
+    get_group_positions,
+    get_profile,
     get_registered_users,
     get_random_questions_df,
-    get_unique_col_values,
+    get_serialized_payload,
+    get_stratified_questions_df,
+    grade_submissions,
+    is_admin,
+    is_admin_request,
+    ProfiledRoute,
+    ProfilingMiddleware,
+    revoke_session_token,
+    UnknownBankError,
+    verify_session_token,
+    warm_up_bank,
 )
 
 
+logger = logging.getLogger(__name__)
+
+
+# Jinja2 // Create a Jinja2Templates instance for rendering HTML templates
+templates = Jinja2Templates(directory="templates")
+
+
+def warm_up(app: FastAPI) -> None:
+    """
+    Preloads the question bank with its indexes and payloads and primes the
+    Jinja2 template, then marks the app as ready.
+    """
+    try:
+        app.state.bank_version = warm_up_bank()["version"]
+        templates.get_template("index.html")
+        app.state.ready = True
+
+    except Exception:
+        logger.exception("Warm-up failed, the app stays not ready")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Starts the warm-up in a background thread, so "/healthz" answers right away
+    while "/readyz" reports not ready until the bank is loaded.
+    """
+    app.state.ready = False
+    app.state.bank_version = None
+
+    if not SESSION_SECRET_FROM_ENV:
+        logger.warning(
+            "SESSION_SECRET is not set: session tokens are signed with a random "
+            "secret and only valid in this worker until it restarts."
+        )
+
+    warm_up_task = asyncio.create_task(asyncio.to_thread(warm_up, app))
+
+    yield
+
+    await warm_up_task
+
+
+def get_payload_response(
+    request: Request, snapshot: dict, payload_name: str
+) -> Response:
+    """
+    Returns a pre-serialized payload of a bank snapshot with the bank version as
+    ETag, or an empty 304 response if the client already has this version.
+    """
+    etag = f'"{snapshot["bank"]}-{snapshot["version"]}-{payload_name}"'
+
+    if request.headers.get("If-None-Match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+
+    return Response(
+        content=get_serialized_payload(snapshot, payload_name),
+        media_type="application/json",
+        headers={"ETag": etag},
+    )
+
+
 # Create a FastAPI instance
 api = FastAPI(
     title="MAY25 BMLOPS // FastAPI",
     description="FastAPI app returning random questions via endpoints or Streamlit app.",
     version="0.0.1",
+    lifespan=lifespan,
 )
 
-
-# Jinja2 // Create a Jinja2Templates instance for rendering HTML templates
-templates = Jinja2Templates(directory="templates")
+# Sample the thread pool threads of sync endpoints while their request is profiled
+api.router.route_class = ProfiledRoute
 
 # Mount static files directory - this makes files in "static" folder accessible via URL
 api.mount("/static", StaticFiles(directory="static"), name="static")
 
+# Profile single requests on demand (admin only, see ProfilingMiddleware)
+api.add_middleware(ProfilingMiddleware)
+
+
+@api.exception_handler(UnknownBankError)
+def unknown_bank_handler(request: Request, error: UnknownBankError) -> JSONResponse:
+    """
+    Answers requests for a bank without Excel file like other errors of the API.
+    """
+    return JSONResponse(
+        {"status": "error", "message": f"Unknown bank: {error.args[0]}"},
+    )
+
 
 @api.get("/", name="Project landing page", response_class=HTMLResponse)
 async def get_index(request: Request) -> HTMLResponse:
@@ -62,6 +165,51 @@ async def get_index(request: Request) -> HTMLResponse:
     )
 
 
+@api.get("/healthz", name="Liveness check")
+async def healthz() -> dict:
+    """
+    The "healthz" route tells that the process is alive. It does no I/O and runs
+    on the event loop, so it doesn't wait for a thread of the busy thread pool.
+
+    Returns:
+        dict: A dictionary containing the status "ok".
+    """
+    return {"status": "ok"}
+
+
+@api.get("/readyz", name="Readiness check")
+async def readyz(request: Request) -> JSONResponse:
+    """
+    The "readyz" route tells if the question bank is loaded and the app can serve traffic.
+    It only reads the app state and runs on the event loop like "healthz".
+
+    Args:
+        request (Request): The FastAPI request object.
+
+    Returns:
+        JSONResponse: Status "ready" with the bank version (status code 200), or status
+        "not_ready" (status code 503). A warm-up error is only logged.
+    """
+    state = request.app.state
+
+    if getattr(state, "ready", False):
+        return JSONResponse({"status": "ready", "bank_version": state.bank_version})
+
+    return JSONResponse({"status": "not_ready"}, status_code=503)
+
+
+@api.get("/banks", name="Get question banks")
+def get_banks() -> dict:
+    """
+    The "banks" route returns the available question banks with their load, hit
+    and eviction counts, whether they are resident and their estimated memory use.
+
+    Returns:
+        dict: A dictionary containing the memory budget, the memory used and the stats per bank.
+    """
+    return bank_registry.get_stats()
+
+
 @api.get("/registered_users", name="Get registered users")
 def get_registered_users_from_file() -> dict:
     """
@@ -78,13 +226,18 @@ def get_registered_users_from_file() -> dict:
 
 
 @api.get("/check_user_login", name="Check user login")
-def check_user_login(request: Request) -> str:
+def check_user_login(request: Request, response: Response) -> str:
     """
     The 'check_user_login' route checks if the provided user name and password
     from headers match a registered user.
 
+    On success a signed session token is returned in the "X-Session-Token" header,
+    with its expiry time (Unix time) in "X-Session-Expires". Protected routes accept
+    it as "Authorization: Bearer <token>" instead of the password.
+
     Args:
         request (Request): The FastAPI request object containing headers.
+        response (Response): The FastAPI response object to add the token headers to.
 
     Returns:
         str: Returns "admin" if the user is an admin, "user" if the user is registered,
@@ -94,47 +247,148 @@ def check_user_login(request: Request) -> str:
     user_name = request.headers.get("X-Username", "")
     password = request.headers.get("X-Password", "")
 
-    registered_users = get_registered_users()
-
     if user_name == "" or password == "":
         return "no_login_info"
-    elif user_name == "admin" and password == "4dm1n":
-        return "admin"
-    elif user_name in registered_users and password == registered_users[user_name]:
-        return "user"
+    elif is_admin(user_name, password):
+        login_type = "admin"
     else:
-        return "login_failed"
+        registered_users = get_registered_users()
+
+        if user_name in registered_users and password == registered_users[user_name]:
+            login_type = "user"
+        else:
+            return "login_failed"
+
+    session = create_session_token(user_name, login_type)
+    response.headers["X-Session-Token"] = session["token"]
+    response.headers["X-Session-Expires"] = str(session["expires_at"])
+
+    return login_type
+
+
+@api.post("/refresh_token", name="Refresh session token")
+def refresh_token(request: Request) -> dict:
+    """
+    The "refresh_token" route exchanges a valid session token for a new one.
+    The old token is revoked, so a token can only be refreshed once. Tokens can't
+    be refreshed beyond SESSION_MAX_AGE after the login with password, the user
+    has to log in again then.
+
+    Args:
+        request (Request): The FastAPI request object with the header
+            "Authorization: Bearer <token>".
+
+    Returns:
+        dict: A dictionary containing the status of the operation, the new "token"
+        and its expiry time "expires_at" (Unix time).
+    """
+    payload = verify_session_token(
+        get_bearer_token(request.headers.get("Authorization", ""))
+    )
+
+    if payload is None:
+        return {
+            "status": "error",
+            "message": "Unauthorized: Valid session token required",
+        }
+
+    auth_time = payload.get("auth_time", 0)
+
+    if time.time() - auth_time >= SESSION_MAX_AGE:
+        return {
+            "status": "error",
+            "message": "Unauthorized: Session expired, please log in again",
+        }
+
+    # Only one of several concurrent refreshes of the same token gets a new token
+    if not revoke_session_token(payload):
+        return {
+            "status": "error",
+            "message": "Unauthorized: Valid session token required",
+        }
+
+    session = create_session_token(payload["sub"], payload["role"], auth_time=auth_time)
+
+    return {
+        "status": "success",
+        "token": session["token"],
+        "expires_at": session["expires_at"],
+    }
+
+
+@api.post("/revoke_token", name="Revoke session token")
+def revoke_token(request: Request) -> dict:
+    """
+    The "revoke_token" route revokes a session token, e.g. on logout.
+
+    The revocation is only known to the worker process which handles this request.
+    With several workers sharing SESSION_SECRET, the token is still accepted and
+    refreshable by the other workers until it expires (at most SESSION_TOKEN_TTL).
+
+    Args:
+        request (Request): The FastAPI request object with the header
+            "Authorization: Bearer <token>".
+
+    Returns:
+        dict: A dictionary containing the status of the operation.
+    """
+    payload = verify_session_token(
+        get_bearer_token(request.headers.get("Authorization", ""))
+    )
+
+    if payload is None:
+        return {
+            "status": "error",
+            "message": "Unauthorized: Valid session token required",
+        }
+
+    revoke_session_token(payload)
+
+    return {
+        "status": "success",
+        "message": "Session token revoked",
+    }
 
 
 @api.get("/test_types", name="Get test types")
-def get_test_types():
+def get_test_types(request: Request, bank: str = DEFAULT_BANK):
     """
     The "test_types" route returns a list of unique test types which are available.
 
+    The response carries the bank version as ETag and is answered with 304 if the
+    client sends the same ETag in "If-None-Match".
+
+    Args:
+        request (Request): The FastAPI request object containing headers.
+        bank (str): The question bank (default is "en").
+
     Returns:
         list: List of all available test types.
     """
 
-    questions_df = get_DataFrame_from_Excel()
+    snapshot = get_bank_snapshot(bank)
 
-    test_types = get_unique_col_values(questions_df, "use")
-
-    return test_types
+    return get_payload_response(request, snapshot, "test_types")
 
 
 @api.get("/categories", name="Get categories")
-def get_categories():
+def get_categories(request: Request, bank: str = DEFAULT_BANK):
     """
     The "categories" route returns a list of unique categories which are available.
 
+    The response carries the bank version as ETag and is answered with 304 if the
+    client sends the same ETag in "If-None-Match".
+
+    Args:
+        request (Request): The FastAPI request object containing headers.
+        bank (str): The question bank (default is "en").
+
     Returns:
         list: List of all available categories.
     """
-    questions_df = get_DataFrame_from_Excel()
-
-    categories = get_unique_col_values(questions_df, "subject")
+    snapshot = get_bank_snapshot(bank)
 
-    return categories
+    return get_payload_response(request, snapshot, "categories")
 
 
 @api.get(
@@ -142,25 +396,120 @@ def get_categories():
     name="Get DataFrame with questions",
 )
 def get_questions_endpoint(
-    subject: str = "All", use: str = "All", question_count: str = "All"
+    request: Request,
+    subject: str = "All",
+    use: str = "All",
+    question_count: str = "All",
+    strategy: str = "uniform",
+    weights: str = "",
+    bank: str = DEFAULT_BANK,
 ):
     """
     The "questions" route returns either a DataFrame with all questions or a filtered DataFrame with random questions based on test type 'use' and test category 'subject' and "question_count".
 
+    With several categories, "strategy" controls how questions are spread over them:
+    "uniform" draws from the union, "stratified" draws the same number per category
+    and "proportional" draws relative to each category's size. "weights" such as
+    "Docker:2,Databases:1" draws relative to the given weights instead; combined with
+    "subject", only the weighted categories which are also selected are drawn.
+
     Args:
+        request (Request): The FastAPI request object containing headers.
         subject (str): The category to filter by (default is "All").
         use (str): The test type to filter questions by (default is "All").
         question_count (int): The number of random questions to return (default is "All").
+        strategy (str): "uniform", "stratified" or "proportional" (default is "uniform").
+        weights (str): Comma-separated "category:weight" pairs (default is "").
+        bank (str): The question bank (default is "en").
 
     Returns:
         dict: A dictionary containing the selected questions.
     """
-    questions_df = get_DataFrame_from_Excel()
+    if strategy not in ("uniform", "stratified", "proportional"):
+        return {
+            "status": "error",
+            "message": "Unknown strategy: use 'uniform', 'stratified' or 'proportional'",
+        }
+
+    if question_count != "All" and not question_count.isdigit():
+        return {
+            "status": "error",
+            "message": "question_count must be 'All' or a positive integer",
+        }
+
+    snapshot = get_bank_snapshot(bank)
+
+    if strategy != "uniform" and weights != "":
+        return {
+            "status": "error",
+            "message": "Use either strategy or weights, not both",
+        }
+
+    if strategy != "uniform" or weights != "":
+        weights_error = {
+            "status": "error",
+            "message": (
+                "weights must be comma-separated 'category:weight' pairs "
+                "with non-negative weights, not all zero"
+            ),
+        }
+        weights_dict = {}
+
+        try:
+            for pair in filter(None, weights.split(",")):
+                weight_subject, weight = pair.rsplit(":", 1)
+                weights_dict[weight_subject] = float(weight)
+        except ValueError:
+            weights_dict = None
+
+        if weights_dict is None or not all(
+            math.isfinite(weight) and weight >= 0 for weight in weights_dict.values()
+        ):
+            return weights_error
+
+        # Only weight categories which are selected in subject
+        if weights_dict and subject != "All":
+            subject_set = set(subject.split(","))
+            weights_dict = {
+                weight_subject: weight
+                for weight_subject, weight in weights_dict.items()
+                if weight_subject in subject_set
+            }
+
+            if not weights_dict:
+                return {
+                    "status": "error",
+                    "message": "weights must name at least one of the selected categories",
+                }
+
+        if weights_dict and sum(weights_dict.values()) == 0:
+            return weights_error
+
+        if weights_dict:
+            subject_list = list(weights_dict)
+        elif subject == "All":
+            subject_list = list(get_group_positions(snapshot, "subject"))
+        else:
+            # Remove duplicates while keeping the order, like "isin" does for "uniform"
+            subject_list = list(dict.fromkeys(subject.split(",")))
+
+        random_questions_df = get_stratified_questions_df(
+            snapshot,
+            subject_list,
+            use,
+            question_count,
+            allocation="proportional" if strategy == "proportional" else "equal",
+            weights=weights_dict,
+        )
+
+        return {"questions": random_questions_df.to_dict(orient="records")}
+
+    questions_df = snapshot["questions_df"]
 
     if use == "All" and subject == "All" and question_count == "All":
 
-        # Convert DataFrame to dictionary for JSON serialization
-        return {"questions": questions_df.to_dict(orient="records")}
+        # Serve the pre-serialized JSON of all questions
+        return get_payload_response(request, snapshot, "questions")
 
     else:
         random_questions_df = questions_df.copy()
@@ -181,6 +530,65 @@ def get_questions_endpoint(
         return {"questions": random_questions_df.to_dict(orient="records")}
 
 
+@api.get("/questions/export", name="Export questions in columnar formats")
+def export_questions(
+    request: Request,
+    format: str = "arrow",
+    use: str = "All",
+    subject: str = "All",
+    bank: str = DEFAULT_BANK,
+):
+    """
+    The "questions/export" route returns the questions of the current bank, optionally
+    filtered by test type 'use' and test category 'subject', as Arrow IPC stream,
+    Parquet or CSV file, serialized from the bank's in-memory Arrow table.
+
+    The response carries the bank version and filters as ETag and is answered with
+    304 if the client sends the same ETag in "If-None-Match".
+
+    Args:
+        request (Request): The FastAPI request object containing headers.
+        format (str): "arrow", "parquet" or "csv" (default is "arrow").
+        use (str): The test type to filter questions by (default is "All").
+        subject (str): Comma-separated categories to filter by (default is "All").
+        bank (str): The question bank (default is "en").
+
+    Returns:
+        Response: The serialized questions.
+    """
+    if format not in EXPORT_FORMATS:
+        return {
+            "status": "error",
+            "message": "Unknown format: use 'arrow', 'parquet' or 'csv'",
+        }
+
+    snapshot = get_bank_snapshot(bank)
+    filters_hash = hashlib.sha1(f"{use}|{subject}".encode("utf-8")).hexdigest()[:12]
+    etag = f'"{bank}-{snapshot["version"]}-{format}-{filters_hash}"'
+
+    if request.headers.get("If-None-Match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+
+    try:
+        payload = get_export_payload(snapshot, format, use=use, subject=subject)
+    except ImportError:
+        return {
+            "status": "error",
+            "message": "Export requires pyarrow to be installed on the server",
+        }
+
+    media_type, extension = EXPORT_FORMATS[format]
+
+    return Response(
+        content=payload,
+        media_type=media_type,
+        headers={
+            "ETag": etag,
+            "Content-Disposition": f'attachment; filename="questions.{extension}"',
+        },
+    )
+
+
 @api.post("/add_question", name="Add new question to database")
 def add_question(request: Request, question_dict: dict) -> dict:
     """
@@ -188,18 +596,15 @@ def add_question(request: Request, question_dict: dict) -> dict:
     questions DataFrame and save it as Excel file.
 
     Args:
-        request (Request): The FastAPI request object containing headers with credentials.
+        request (Request): The FastAPI request object containing headers with a
+            session token or credentials.
         new_question (list): The new question's details
 
     Returns:
         dict: A dictionary containing the status of the operation and the new question.
     """
-    # Extract credentials from headers
-    user_name = request.headers.get("X-Username", "")
-    password = request.headers.get("X-Password", "")
-
-    # Check if the user is an admin
-    if not (user_name == "admin" and password == "4dm1n"):
+    # Check if the user is an admin (session token or credentials in headers)
+    if not is_admin_request(request.headers):
         return {
             "status": "error",
             "message": "Unauthorized: Admin credentials required",
@@ -216,3 +621,90 @@ def add_question(request: Request, question_dict: dict) -> dict:
         "message": "Question received successfully",
         "question": question_dict,
     }
+
+
+@api.post("/grade", name="Grade submitted quiz answers")
+def grade(submissions_dict: dict, bank: str = DEFAULT_BANK) -> dict:
+    """
+    The "grade" route scores many quiz submissions in one request.
+
+    The answer key is parsed from the "correct" column once per bank version and
+    all submissions are scored together with vectorized operations.
+
+    Args:
+        submissions_dict (dict): Dictionary with a list of "submissions", each with an
+            optional "id" and a list of "answers" like {"nr": 1, "selected": "A,C"}.
+        bank (str): The question bank the answers refer to (default is "en").
+
+    Returns:
+        dict: A dictionary containing the status of the operation, the scores per
+        submission and the statistics per question.
+    """
+    submissions = submissions_dict.get("submissions") if submissions_dict else None
+
+    if not isinstance(submissions, list) or len(submissions) == 0:
+        return {
+            "status": "error",
+            "message": "No submissions provided",
+        }
+
+    if not all(
+        isinstance(submission, dict)
+        and isinstance(submission.get("answers", []), list)
+        and all(isinstance(answer, dict) for answer in submission.get("answers", []))
+        for submission in submissions
+    ):
+        return {
+            "status": "error",
+            "message": "Each submission needs a list of answers with 'nr' and 'selected'",
+        }
+
+    snapshot = get_bank_snapshot(bank)
+    answer_key = get_answer_key(snapshot)
+
+    grading = grade_submissions(submissions, answer_key)
+
+    return {
+        "status": "success",
+        "bank": bank,
+        "bank_version": snapshot["version"],
+        "results": grading["results"],
+        "statistics": grading["statistics"],
+    }
+
+
+@api.get("/profiles/{profile_id}", name="Get request profile")
+def get_request_profile(request: Request, profile_id: str) -> dict:
+    """
+    The "profiles" route returns a stored request profile to an admin user.
+
+    A request is profiled if it is sent with the header "X-Profile: 1" and admin
+    credentials. Its profile id is returned in the "X-Profile-Id" header.
+
+    Args:
+        request (Request): The FastAPI request object containing headers with a
+            session token or credentials.
+        profile_id (str): Id of the profile.
+
+    Returns:
+        dict: A dictionary containing the status of the operation and the profile.
+    """
+    # Check if the user is an admin (session token or credentials in headers)
+    if not is_admin_request(request.headers):
+        return {
+            "status": "error",
+            "message": "Unauthorized: Admin credentials required",
+        }
+
+    profile = get_profile(profile_id)
+
+    if not profile:
+        return {
+            "status": "error",
+            "message": f"Profile {profile_id} not found",
+        }
+
+    return {
+        "status": "success",
+        "profile": profile,
+    }
@@ -0,0 +1,171 @@
+import asyncio
+import os
+import time
+
+import pytest
+import requests
+
+from fastapi.testclient import TestClient
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+import client
+import main
+import utils
+
+
+BASE_URL = "http://testserver"
+ADMIN = {"user_name": "admin", "password": "4dm1n"}
+
+
+@pytest.fixture(autouse=True)
+def repo_dir(monkeypatch):
+    # The banks, templates and static files are looked up relative to the working directory
+    monkeypatch.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def test_client():
+    return TestClient(main.api, base_url=BASE_URL)
+
+
+@pytest.fixture
+def sent():
+    # (method, path, status code) of every request the quiz clients send to the app
+    return []
+
+
+class TestClientAdapter(BaseAdapter):
+    """
+    Sends the requests of a requests.Session to the app through a TestClient.
+    """
+
+    def __init__(self, test_client: TestClient, sent: list):
+        super().__init__()
+        self.test_client = test_client
+        self.sent = sent
+
+    def send(self, request, **kwargs):
+        test_response = self.test_client.request(
+            request.method,
+            request.url,
+            headers=dict(request.headers),
+            content=request.body,
+        )
+        self.sent.append(
+            (request.method, test_response.request.url.path, test_response.status_code)
+        )
+
+        response = requests.Response()
+        response.status_code = test_response.status_code
+        response.headers = CaseInsensitiveDict(test_response.headers)
+        response._content = test_response.content
+        response.url = request.url
+        response.request = request
+
+        return response
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def quiz_client(test_client, sent):
+    quiz_client = client.QuizClient(base_url=BASE_URL, **ADMIN)
+    quiz_client.session.mount(BASE_URL, TestClientAdapter(test_client, sent))
+
+    return quiz_client
+
+
+@pytest.fixture
+def async_quiz_client(test_client, sent):
+    async_quiz_client = client.AsyncQuizClient(base_url=BASE_URL, **ADMIN)
+
+    async def send(method, path, headers, **kwargs):
+        # Let concurrent requests interleave like on a real connection
+        await asyncio.sleep(0)
+        response = test_client.request(method, path, headers=headers, **kwargs)
+        sent.append((method, path, response.status_code))
+        await asyncio.sleep(0)
+
+        data = response.json() if response.status_code != 304 else None
+        return response.status_code, response.headers, data
+
+    async_quiz_client._send = send
+
+    return async_quiz_client
+
+
+def test_quiz_client_etag(quiz_client, sent):
+    categories = quiz_client.categories()
+    cached_categories = quiz_client.categories()
+
+    assert cached_categories == categories
+    assert "Docker" in categories
+    assert sent == [("GET", "/categories", 200), ("GET", "/categories", 304)]
+
+
+def test_quiz_client_login_after_unauthorized(quiz_client, sent, monkeypatch):
+    assert quiz_client.check_login() == "admin"
+
+    # A restarted server signs with another secret and rejects the token
+    monkeypatch.setattr(utils, "SESSION_SECRET", os.urandom(32))
+    data = quiz_client.add_question({"question": "New question?"})
+
+    assert data["status"] == "success"
+    assert [path for _, path, _ in sent] == [
+        "/check_user_login",
+        "/add_question",
+        "/check_user_login",
+        "/add_question",
+    ]
+
+
+def test_async_quiz_client_etag(async_quiz_client, sent):
+    async def get_categories():
+        return (
+            await async_quiz_client.categories(),
+            await async_quiz_client.categories(),
+        )
+
+    categories, cached_categories = asyncio.run(get_categories())
+
+    assert cached_categories == categories
+    assert "Docker" in categories
+    assert sent == [("GET", "/categories", 200), ("GET", "/categories", 304)]
+
+
+def test_async_quiz_client_login_after_unauthorized(
+    async_quiz_client, sent, monkeypatch
+):
+    async def add_question():
+        await async_quiz_client.check_login()
+        monkeypatch.setattr(utils, "SESSION_SECRET", os.urandom(32))
+
+        return await async_quiz_client.add_question({"question": "New question?"})
+
+    assert asyncio.run(add_question())["status"] == "success"
+    assert [path for _, path, _ in sent] == [
+        "/check_user_login",
+        "/add_question",
+        "/check_user_login",
+        "/add_question",
+    ]
+
+
+def test_async_quiz_client_refreshes_once(async_quiz_client, sent):
+    async def get_quizzes():
+        await async_quiz_client.check_login()
+
+        # The token expires within TOKEN_REFRESH_MARGIN
+        async_quiz_client.token_expires_at = int(time.time()) + 10
+
+        return await async_quiz_client.quizzes(
+            [{"subject": "Docker", "question_count": 2}] * 5
+        )
+
+    quizzes = asyncio.run(get_quizzes())
+
+    assert [len(questions) for questions in quizzes] == [2] * 5
+    assert [path for _, path, _ in sent].count("/refresh_token") == 1
+    assert [path for _, path, _ in sent].count("/check_user_login") == 1
@@ -0,0 +1,142 @@
+import io
+import os
+import time
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet
+import pytest
+
+from fastapi.testclient import TestClient
+
+import main
+import utils
+
+
+@pytest.fixture(autouse=True)
+def repo_dir(monkeypatch):
+    # The banks, templates and static files are looked up relative to the working directory
+    monkeypatch.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def client():
+    # Without the lifespan, so the bank is loaded on the first request
+    return TestClient(main.api)
+
+
+def get_auth_headers(token: str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
+
+
+# Session tokens
+
+
+def test_refresh_token_once(client):
+    token = utils.create_session_token("admin", "admin")["token"]
+
+    first = client.post("/refresh_token", headers=get_auth_headers(token)).json()
+    second = client.post("/refresh_token", headers=get_auth_headers(token)).json()
+
+    assert first["status"] == "success"
+    assert utils.verify_session_token(first["token"])["role"] == "admin"
+    assert second["status"] == "error"
+
+
+def test_refresh_token_max_age(client):
+    auth_time = int(time.time()) - utils.SESSION_MAX_AGE + 30
+    token = utils.create_session_token("admin", "admin", auth_time=auth_time)["token"]
+
+    data = client.post("/refresh_token", headers=get_auth_headers(token)).json()
+
+    # The carried over auth_time caps the new token
+    assert data["expires_at"] == auth_time + utils.SESSION_MAX_AGE
+    assert utils.verify_session_token(data["token"])["auth_time"] == auth_time
+
+
+def test_refresh_token_beyond_max_age(client, monkeypatch):
+    session = utils.create_session_token("admin", "admin")
+
+    monkeypatch.setattr(utils, "SESSION_MAX_AGE", 0)
+    monkeypatch.setattr(main, "SESSION_MAX_AGE", 0)
+    data = client.post(
+        "/refresh_token", headers=get_auth_headers(session["token"])
+    ).json()
+
+    assert data == {
+        "status": "error",
+        "message": "Unauthorized: Session expired, please log in again",
+    }
+
+
+# Export
+
+
+def read_export(content: bytes, export_format: str):
+    if export_format == "arrow":
+        return pa.ipc.open_stream(content).read_all().to_pandas()
+
+    return pyarrow.parquet.read_table(io.BytesIO(content)).to_pandas()
+
+
+@pytest.mark.parametrize("export_format", ["arrow", "parquet"])
+def test_export_round_trip(client, export_format):
+    response = client.get("/questions/export", params={"format": export_format})
+    exported_df = read_export(response.content, export_format)
+    questions_df = utils.get_bank_snapshot()["questions_df"]
+
+    assert response.status_code == 200
+    assert list(exported_df.columns) == ["nr"] + list(questions_df.columns)
+    assert exported_df["nr"].tolist() == questions_df.index.tolist()
+
+    # All cells are exported as strings
+    exported_values = exported_df.drop(columns="nr").astype("string").fillna("<NA>")
+    expected_values = questions_df.astype("string").fillna("<NA>")
+    assert (exported_values.to_numpy() == expected_values.to_numpy()).all()
+
+
+@pytest.mark.parametrize(
+    "use, subject",
+    [
+        ("Validation test", "All"),
+        ("All", "Docker,Databases"),
+        ("Validation test", "Distributed systems,Docker"),
+        ("All", "Unknown"),
+    ],
+)
+def test_export_filters_match_questions(client, use, subject):
+    exported_df = read_export(
+        client.get(
+            "/questions/export",
+            params={"format": "parquet", "use": use, "subject": subject},
+        ).content,
+        "parquet",
+    )
+    questions = client.get(
+        "/questions", params={"use": use, "subject": subject}
+    ).json()["questions"]
+
+    assert sorted(exported_df["question"]) == sorted(
+        question["question"] for question in questions
+    )
+
+
+def test_export_etag(client):
+    params = {"format": "arrow", "subject": "Docker"}
+    response = client.get("/questions/export", params=params)
+    etag = response.headers["ETag"]
+
+    cached = client.get(
+        "/questions/export", params=params, headers={"If-None-Match": etag}
+    )
+    assert cached.status_code == 304
+    assert cached.content == b""
+
+    # Other filters have another ETag
+    other = client.get(
+        "/questions/export",
+        params={"format": "arrow", "subject": "Databases"},
+        headers={"If-None-Match": etag},
+    )
+    assert other.status_code == 200
+    assert other.headers["ETag"] != etag
@@ -0,0 +1,430 @@
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import utils
+
+
+@pytest.fixture(autouse=True)
+def repo_dir(monkeypatch):
+    # The banks are looked up relative to the working directory
+    monkeypatch.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def answer_key():
+    return utils.get_answer_key(utils.get_bank_snapshot())
+
+
+# Grading
+
+
+def test_letters_to_bitmasks():
+    letters = pd.Series(["A", "B,C", "A C", "A, B", "A B C D", "None", None, ""])
+
+    assert utils.letters_to_bitmasks(letters).tolist() == [1, 6, 5, 3, 15, 0, 0, 0]
+
+
+def test_grade_submissions_scores(answer_key):
+    submissions = [
+        {
+            "id": "all_correct",
+            "answers": [
+                {"nr": 1, "selected": "A"},
+                {"nr": 2, "selected": "C"},
+                {"nr": 24, "selected": ["B", "C"]},
+                {"nr": 47, "selected": "A,B,C,D"},
+            ],
+        },
+        {
+            "id": "all_wrong",
+            "answers": [
+                {"nr": 1, "selected": "B"},
+                {"nr": 24, "selected": "B"},
+                {"nr": 47, "selected": "A B C"},
+            ],
+        },
+        {"id": "empty", "answers": []},
+    ]
+
+    grading = utils.grade_submissions(submissions, answer_key)
+
+    assert [result["score"] for result in grading["results"]] == [4, 0, 0]
+    assert [result["answered"] for result in grading["results"]] == [4, 3, 0]
+    assert {
+        stat["nr"]: (stat["attempts"], stat["correct"])
+        for stat in grading["statistics"]
+    } == {
+        1: (2, 1),
+        2: (1, 1),
+        24: (2, 1),
+        47: (2, 1),
+    }
+
+
+def test_grade_submissions_unknown_and_duplicates(answer_key):
+    submissions = [
+        {
+            "answers": [
+                {"nr": 1.7, "selected": "A"},
+                {"nr": 1e30, "selected": "A"},
+                {"nr": True, "selected": "A"},
+                {"nr": 9999, "selected": "A"},
+                {"nr": "abc", "selected": "A"},
+                {"nr": 1, "selected": "B"},
+                {"nr": 1, "selected": "A"},
+                {"nr": 2.0, "selected": "C"},
+            ]
+        }
+    ]
+
+    result = utils.grade_submissions(submissions, answer_key)["results"][0]
+
+    assert result == {
+        "id": 0,
+        "score": 2,
+        "answered": 2,
+        "unknown": 5,
+        "duplicates": 1,
+        "ungradable": 0,
+    }
+
+
+def test_grade_submissions_ungradable_and_missing_selection(answer_key):
+    # Questions 69 to 76 have no correct letter in questions_en.xlsx
+    submissions = [
+        {
+            "answers": [
+                {"nr": 69, "selected": ""},
+                {"nr": 70},
+                {"nr": 1},
+                {"nr": 2, "selected": None},
+                {"nr": 24, "selected": "B,C"},
+            ]
+        }
+    ]
+
+    grading = utils.grade_submissions(submissions, answer_key)
+
+    assert grading["results"][0] == {
+        "id": 0,
+        "score": 1,
+        "answered": 3,
+        "unknown": 0,
+        "duplicates": 0,
+        "ungradable": 2,
+    }
+    assert [stat["nr"] for stat in grading["statistics"]] == [1, 2, 24]
+
+
+# Sampling
+
+
+@pytest.mark.parametrize(
+    "sizes, shares, total, expected",
+    [
+        # Equal quotas, the small group's shortfall goes to the large group
+        ([5, 17], [1, 1], 10, [5, 5]),
+        ([5, 17], [1, 1], 14, [5, 9]),
+        # Proportional quotas with the leftover going to the largest remainder
+        ([5, 17], [5, 17], 10, [2, 8]),
+        # Weighted quotas capped at the group size
+        ([5, 6], [3, 1], 8, [5, 3]),
+        # Zero share
+        ([5, 6], [0, 1], 4, [0, 4]),
+        # More questions than available: quotas follow the shares, groups are resampled
+        ([5, 17], [1, 1], 30, [15, 15]),
+    ],
+)
+def test_allocate_quotas(sizes, shares, total, expected):
+    quotas = utils.allocate_quotas(
+        np.array(sizes), np.array(shares, dtype=float), total, np.random.default_rng(0)
+    )
+
+    assert quotas.tolist() == expected
+
+
+@pytest.mark.parametrize(
+    "subjects, use, question_count, allocation, weights, expected",
+    [
+        (
+            ["Docker", "Distributed systems"],
+            "All",
+            "10",
+            "equal",
+            None,
+            {"Docker": 5, "Distributed systems": 5},
+        ),
+        (
+            ["Docker", "Distributed systems"],
+            "All",
+            "14",
+            "equal",
+            None,
+            {"Docker": 5, "Distributed systems": 9},
+        ),
+        (
+            ["Docker", "Distributed systems"],
+            "All",
+            "10",
+            "proportional",
+            None,
+            {"Docker": 2, "Distributed systems": 8},
+        ),
+        (
+            ["Docker", "Databases"],
+            "All",
+            "8",
+            "equal",
+            {"Docker": 3, "Databases": 1},
+            {"Docker": 5, "Databases": 3},
+        ),
+        (
+            ["Docker", "Automation"],
+            "Validation test",
+            "6",
+            "equal",
+            None,
+            {"Automation": 6},
+        ),
+        (
+            ["Docker", "Databases"],
+            "All",
+            "All",
+            "equal",
+            None,
+            {"Docker": 5, "Databases": 6},
+        ),
+        # A subject listed twice is drawn once
+        (["Docker", "Docker"], "All", "5", "equal", None, {"Docker": 5}),
+        (["Docker", "Docker"], "All", "All", "equal", None, {"Docker": 5}),
+    ],
+)
+def test_get_stratified_questions_df(
+    subjects, use, question_count, allocation, weights, expected
+):
+    questions_df = utils.get_stratified_questions_df(
+        utils.get_bank_snapshot(),
+        subjects,
+        use,
+        question_count,
+        allocation=allocation,
+        weights=weights,
+    )
+
+    assert questions_df["subject"].value_counts().to_dict() == expected
+    assert questions_df.index.is_unique
+    if use != "All":
+        assert (questions_df["use"] == use).all()
+
+
+# Preview
+
+
+def get_new_question_dict(nr: int) -> dict:
+    return {
+        "new_question": {
+            "nr": nr,
+            "question": "New question?",
+            "subject": "Docker",
+            "use": "Positioning test",
+            "correct": "A",
+            "responseA": "Yes",
+            "responseB": "No",
+            "responseC": None,
+            "responseD": None,
+            "remark": None,
+        }
+    }
+
+
+@pytest.mark.parametrize("nr", [77, 1000, 76, 40, 1])
+@pytest.mark.parametrize("page_size", [25, 10, 100])
+def test_get_questions_preview_df(nr, page_size):
+    snapshot = utils.get_bank_snapshot()
+    new_question_dict = get_new_question_dict(nr)
+    all_questions_df = utils.get_all_questions_df(new_question_dict)
+    page_count = -(-len(all_questions_df) // page_size)
+
+    # Every page including the last, partial one, and the empty page after it
+    for page in range(1, page_count + 2):
+        start = (page - 1) * page_size
+        preview_df = utils.get_questions_preview_df(
+            snapshot, new_question_dict, page=page, page_size=page_size
+        )
+
+        # Pages without the new question keep the bank's column dtypes
+        pd.testing.assert_frame_equal(
+            preview_df,
+            all_questions_df.iloc[start : start + page_size],
+            check_dtype=False,
+        )
+
+
+# Bank registry
+
+
+@pytest.fixture
+def banks_dir(tmp_path, monkeypatch):
+    for bank in ("a", "b", "c"):
+        shutil.copy("questions_en.xlsx", tmp_path / f"questions_{bank}.xlsx")
+
+    monkeypatch.setattr(utils, "BANKS_DIR", str(tmp_path))
+
+    return tmp_path
+
+
+@pytest.fixture
+def bank_size(banks_dir):
+    registry = utils.BankRegistry()
+    registry.get("a")
+
+    return registry.sizes["a"]
+
+
+def test_bank_registry_evicts_least_recently_used(banks_dir, bank_size):
+    # Room for two banks
+    registry = utils.BankRegistry(memory_budget_mb=2.5 * bank_size / 1024 / 1024)
+
+    registry.get("a")
+    registry.get("b")
+    registry.get("c")
+    assert list(registry.snapshots) == ["b", "c"]
+
+    # A hit makes "b" the most recently used bank, so "c" is evicted next
+    registry.get("b")
+    registry.get("a")
+    assert list(registry.snapshots) == ["b", "a"]
+
+    stats = registry.get_stats()["banks"]
+    assert {
+        bank: (info["loads"], info["hits"], info["evictions"])
+        for bank, info in stats.items()
+    } == {
+        "a": (2, 0, 1),
+        "b": (1, 1, 0),
+        "c": (1, 0, 1),
+    }
+
+
+def test_bank_registry_touch_evicts_when_snapshot_grows(banks_dir, bank_size):
+    registry = utils.BankRegistry(memory_budget_mb=2.5 * bank_size / 1024 / 1024)
+
+    registry.get("a")
+    snapshot = registry.get("b")
+    assert list(registry.snapshots) == ["a", "b"]
+
+    utils.get_serialized_payload(snapshot, "questions")
+    utils.get_answer_key(snapshot)
+    registry.touch(snapshot)
+
+    assert list(registry.snapshots) == ["b"]
+    assert registry.sizes["b"] > bank_size
+
+
+def test_bank_registry_keeps_bank_in_use(banks_dir, bank_size):
+    registry = utils.BankRegistry(memory_budget_mb=0.5 * bank_size / 1024 / 1024)
+
+    registry.get("a")
+    registry.get("b")
+
+    assert list(registry.snapshots) == ["b"]
+
+
+@pytest.mark.parametrize("bank", ["missing", "../a", ""])
+def test_bank_registry_unknown_bank(banks_dir, bank):
+    with pytest.raises(utils.UnknownBankError):
+        utils.BankRegistry().get(bank)
+
+
+# Profiling
+
+
+def test_save_profile_keeps_newest(tmp_path):
+    for profile_id in range(5):
+        file_path = utils.save_profile({"id": profile_id}, str(tmp_path), keep=3)
+        os.utime(file_path, ns=(profile_id * 10**9, profile_id * 10**9))
+
+    assert sorted(os.listdir(tmp_path)) == ["2.json", "3.json", "4.json"]
+
+    # The saved profile is kept even if older profiles look newer
+    utils.save_profile({"id": 5}, str(tmp_path), keep=1)
+    assert os.listdir(tmp_path) == ["5.json"]
+
+
+# Session tokens
+
+
+def test_session_token_round_trip():
+    session = utils.create_session_token("alice", "user")
+
+    payload = utils.verify_session_token(session["token"])
+
+    assert payload["sub"] == "alice"
+    assert payload["role"] == "user"
+    assert payload["exp"] == session["expires_at"]
+    assert payload["exp"] - payload["auth_time"] == utils.SESSION_TOKEN_TTL
+
+
+def test_session_token_tampered():
+    token = utils.create_session_token("alice", "user")["token"]
+    payload_b64, _, signature = token.partition(".")
+
+    payload = json.loads(utils._b64decode(payload_b64))
+    payload["role"] = "admin"
+    forged_b64 = utils._b64encode(json.dumps(payload).encode("utf-8"))
+
+    assert utils.verify_session_token(f"{forged_b64}.{signature}") is None
+    last_char = "B" if signature[-1] == "A" else "A"
+    assert (
+        utils.verify_session_token(f"{payload_b64}.{signature[:-1]}{last_char}") is None
+    )
+    assert utils.verify_session_token(f"{payload_b64}.") is None
+
+
+@pytest.mark.parametrize(
+    "token", ["", ".", "abc", "a.b.c", "!!!.###", "é.signature", "Ω" * 10]
+)
+def test_session_token_malformed(token):
+    assert utils.verify_session_token(token) is None
+
+
+def test_session_token_expiry(monkeypatch):
+    session = utils.create_session_token("alice", "user", ttl=60)
+    now = time.time()
+
+    monkeypatch.setattr(utils.time, "time", lambda: now + 59)
+    assert utils.verify_session_token(session["token"]) is not None
+
+    monkeypatch.setattr(utils.time, "time", lambda: session["expires_at"])
+    assert utils.verify_session_token(session["token"]) is None
+
+
+def test_session_token_revocation():
+    token = utils.create_session_token("alice", "user")["token"]
+    payload = utils.verify_session_token(token)
+
+    assert utils.revoke_session_token(payload)
+    assert utils.verify_session_token(token) is None
+
+    # Only the first revocation counts, so a token can't be refreshed twice
+    assert not utils.revoke_session_token(payload)
+
+
+def test_session_token_max_age():
+    now = int(time.time())
+
+    # A refreshed token doesn't outlive SESSION_MAX_AGE after the password check
+    auth_time = now - utils.SESSION_MAX_AGE + 100
+    session = utils.create_session_token("alice", "user", auth_time=auth_time)
+    assert session["expires_at"] == auth_time + utils.SESSION_MAX_AGE
+
+    # Beyond SESSION_MAX_AGE the refreshed token is expired right away
+    auth_time = now - utils.SESSION_MAX_AGE
+    session = utils.create_session_token("alice", "user", auth_time=auth_time)
+    assert utils.verify_session_token(session["token"]) is None
@@ -3,10 +3,25 @@ import pandas as pd
 import numpy as np
 
 import aiohttp
+import base64
+import functools
+import hashlib
+import hmac
+import inspect
+import io
 import json
+import os
 import random
+import sys
+import threading
+import time
+import uuid
 
-from typing import Dict, List
+from collections import Counter, OrderedDict
+from contextvars import ContextVar
+from fastapi.routing import APIRoute
+
+from typing import Dict, List, Optional
 
 # Importing the requests library for making HTTP requests
 import requests
@@ -36,6 +51,174 @@ def get_registered_users(file_path: str = "registered_users.json") -> dict:
     return registered_users
 
 
+def is_admin(user_name: str, password: str) -> bool:
+    """
+    Checks if the provided credentials belong to the admin.
+
+    Args:
+        user_name (str): User name, e.g. from the "X-Username" header.
+        password (str): Password, e.g. from the "X-Password" header.
+
+    Returns:
+        bool: True if the credentials are the admin credentials, False otherwise.
+    """
+    return user_name == "admin" and password == "4dm1n"
+
+
+# Session tokens // signed, short-lived tokens issued by the "check_user_login" route
+
+# Secret used to sign tokens. Set SESSION_SECRET to share tokens between workers,
+# otherwise tokens are only valid for the process that issued them. Revocation is
+# not shared, see _revoked_tokens.
+SESSION_SECRET_FROM_ENV = bool(os.environ.get("SESSION_SECRET"))
+SESSION_SECRET = os.environ.get("SESSION_SECRET", "").encode("utf-8") or os.urandom(32)
+
+# Lifetime of a session token in seconds
+SESSION_TOKEN_TTL = int(os.environ.get("SESSION_TOKEN_TTL", "900"))
+
+# Maximum time in seconds since the password check, after which tokens can't be refreshed
+SESSION_MAX_AGE = int(os.environ.get("SESSION_MAX_AGE", "28800"))
+
+# Maps the ids of revoked tokens to their expiry time. The list only exists in this
+# process: with several workers sharing SESSION_SECRET, a token revoked by one worker
+# is still accepted (and refreshable) by the others until it expires.
+_revoked_tokens: Dict[str, float] = {}
+_revoked_tokens_lock = threading.Lock()
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _sign(payload_b64: str) -> str:
+    return _b64encode(
+        hmac.new(SESSION_SECRET, payload_b64.encode("ascii"), hashlib.sha256).digest()
+    )
+
+
+def create_session_token(
+    user_name: str, role: str, ttl: int = None, auth_time: int = None
+) -> dict:
+    """
+    Creates a signed session token. It never outlives SESSION_MAX_AGE after the
+    password check at "auth_time".
+
+    Args:
+        user_name (str): Name of the logged in user.
+        role (str): "admin" or "user".
+        ttl (int): Lifetime in seconds (default is SESSION_TOKEN_TTL).
+        auth_time (int): Unix time of the password check, carried over on refresh
+            (default is now).
+
+    Returns:
+        dict: Dictionary with the "token" and its expiry time "expires_at" (Unix time).
+    """
+    now = int(time.time())
+    auth_time = auth_time or now
+    expires_at = min(now + (ttl or SESSION_TOKEN_TTL), auth_time + SESSION_MAX_AGE)
+    payload = {
+        "sub": user_name,
+        "role": role,
+        "auth_time": auth_time,
+        "exp": expires_at,
+        "jti": uuid.uuid4().hex,
+    }
+    payload_b64 = _b64encode(json.dumps(payload, separators=(",", ":")).encode("utf-8"))
+
+    return {"token": f"{payload_b64}.{_sign(payload_b64)}", "expires_at": expires_at}
+
+
+def verify_session_token(token: str) -> Optional[dict]:
+    """
+    Verifies a session token without any file access. The signature is compared
+    in constant time.
+
+    Args:
+        token (str): Token created by create_session_token.
+
+    Returns:
+        dict: The token's payload with "sub", "role", "exp" and "jti", or None if the
+        token is malformed, forged, expired or revoked.
+    """
+    if not token.isascii():
+        return None
+
+    payload_b64, _, signature = token.partition(".")
+
+    if not hmac.compare_digest(signature, _sign(payload_b64)):
+        return None
+
+    try:
+        payload = json.loads(_b64decode(payload_b64))
+    except ValueError:
+        return None
+
+    if payload.get("exp", 0) <= time.time() or payload.get("jti") in _revoked_tokens:
+        return None
+
+    return payload
+
+
+def revoke_session_token(payload: dict) -> bool:
+    """
+    Revokes a verified session token until it expires. Checking and revoking is
+    atomic, so of several concurrent calls with the same token only one succeeds.
+
+    Args:
+        payload (dict): Payload returned by verify_session_token.
+
+    Returns:
+        bool: True if the token was revoked by this call, False if it was already revoked.
+    """
+    now = time.time()
+
+    with _revoked_tokens_lock:
+        if payload["jti"] in _revoked_tokens:
+            return False
+
+        # Forget tokens which expired anyway, so the list stays small
+        for jti, expires_at in list(_revoked_tokens.items()):
+            if expires_at <= now:
+                _revoked_tokens.pop(jti, None)
+
+        _revoked_tokens[payload["jti"]] = payload["exp"]
+
+    return True
+
+
+def get_bearer_token(authorization: str) -> str:
+    """
+    Returns the token of an "Authorization: Bearer <token>" header, or "" if there is none.
+    """
+    scheme, _, token = authorization.partition(" ")
+
+    return token.strip() if scheme.lower() == "bearer" else ""
+
+
+def is_admin_request(headers) -> bool:
+    """
+    Checks if a request is sent by the admin, either with a session token in the
+    "Authorization" header or with admin credentials in "X-Username" and "X-Password".
+
+    Args:
+        headers: Request headers with lower-case keys, e.g. FastAPI's request.headers.
+
+    Returns:
+        bool: True if the request is sent by the admin, False otherwise.
+    """
+    token = get_bearer_token(headers.get("authorization", ""))
+
+    if token:
+        payload = verify_session_token(token)
+        return payload is not None and payload["role"] == "admin"
+
+    return is_admin(headers.get("x-username", ""), headers.get("x-password", ""))
+
+
 # Check if the Streamlit app is running
 async def check_streamlit_status(streamlit_url: str = "http://localhost:8501") -> bool:
     """
@@ -98,6 +281,308 @@ def get_button_config(
     return buttons
 
 
+# Profiling // opt-in sampling profiler for single requests
+
+# Directory where request profiles are stored
+PROFILES_DIR = "profiles"
+
+# Number of profiles kept in PROFILES_DIR, older profiles are deleted
+PROFILES_KEEP = int(os.environ.get("PROFILES_KEEP", "100"))
+
+# Sampler of the request being profiled, visible to the request's task and its threads
+_active_sampler: ContextVar[Optional["StackSampler"]] = ContextVar(
+    "active_sampler", default=None
+)
+
+
+class StackSampler:
+    """
+    Samples the call stacks of the threads working on one request in a background thread.
+
+    The event loop thread is only sampled while it runs the request's own task, i.e.
+    while the request's frame is on its stack, so an idle loop (selectors, uvloop)
+    and other requests are skipped. Thread pool threads are only sampled while they
+    run the request's sync endpoint (see add_thread).
+    """
+
+    def __init__(self, loop_thread_id: int, request_frame, interval: float = 0.001):
+        self.loop_thread_id = loop_thread_id
+        self.request_frame = request_frame
+        self.interval = interval
+        self.stacks = Counter()
+        self._thread_ids = set()
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stops sampling without waiting for the sampler thread, see join.
+        """
+        self._stop_event.set()
+
+    def join(self) -> None:
+        """
+        Waits until the sampler thread finished, after which stacks doesn't change anymore.
+        """
+        self._thread.join()
+
+    def add_thread(self, thread_id: int) -> None:
+        self._thread_ids.add(thread_id)
+
+    def remove_thread(self, thread_id: int) -> None:
+        self._thread_ids.discard(thread_id)
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            thread_ids = self._thread_ids | {self.loop_thread_id}
+
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id not in thread_ids:
+                    continue
+
+                stack = []
+                in_request = thread_id != self.loop_thread_id
+                while frame is not None:
+                    in_request = in_request or frame is self.request_frame
+                    code = frame.f_code
+                    stack.append((code.co_filename, code.co_name, frame.f_lineno))
+                    frame = frame.f_back
+
+                if in_request:
+                    self.stacks[tuple(reversed(stack))] += 1
+
+
+def profiled_endpoint(endpoint):
+    """
+    Wraps a sync endpoint, so the thread pool thread running it is sampled while
+    its request is profiled. Other requests only pay a context variable lookup.
+    """
+
+    @functools.wraps(endpoint)
+    def wrapper(*args, **kwargs):
+        sampler = _active_sampler.get()
+
+        if sampler is None:
+            return endpoint(*args, **kwargs)
+
+        thread_id = threading.get_ident()
+        sampler.add_thread(thread_id)
+        try:
+            return endpoint(*args, **kwargs)
+        finally:
+            sampler.remove_thread(thread_id)
+
+    return wrapper
+
+
+class ProfiledRoute(APIRoute):
+    """
+    Route class registering the threads of sync endpoints with the request's sampler.
+    """
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        if not inspect.iscoroutinefunction(endpoint):
+            endpoint = profiled_endpoint(endpoint)
+
+        super().__init__(path, endpoint, **kwargs)
+
+
+def summarize_stacks(stacks: Counter, top_n: int = 5) -> dict:
+    """
+    Summarizes sampled call stacks into top frames and folded stacks.
+
+    Args:
+        stacks (Counter): Sample count per call stack (outermost frame first).
+        top_n (int): Number of top frames to return.
+
+    Returns:
+        dict: Dictionary with the total number of "samples", the "top" frames by
+        own samples and the "folded" stacks (flame graph format).
+    """
+    samples = sum(stacks.values())
+    own_samples = Counter()
+    folded = Counter()
+
+    for stack, count in stacks.items():
+        filename, func_name, line_no = stack[-1]
+        own_samples[f"{func_name} ({os.path.basename(filename)}:{line_no})"] += count
+        folded[
+            ";".join(
+                f"{func_name} ({os.path.basename(filename)})"
+                for filename, func_name, _ in stack
+            )
+        ] += count
+
+    top = [
+        {"frame": frame, "samples": count, "share": round(count / samples, 4)}
+        for frame, count in own_samples.most_common(top_n)
+    ]
+
+    return {"samples": samples, "top": top, "folded": dict(folded)}
+
+
+def save_profile(
+    profile: dict, profiles_dir: str = PROFILES_DIR, keep: int = None
+) -> str:
+    """
+    Saves a request profile as JSON file and deletes the oldest profiles beyond
+    the newest "keep" ones.
+
+    Args:
+        profile (dict): Profile with at least the key "id".
+        profiles_dir (str): Directory where profiles are stored.
+        keep (int): Number of profiles to keep (default is PROFILES_KEEP).
+
+    Returns:
+        str: Path of the saved profile.
+    """
+    os.makedirs(profiles_dir, exist_ok=True)
+    file_path = os.path.join(profiles_dir, f"{profile['id']}.json")
+
+    with open(file_path, "w", encoding="utf-8") as file:
+        json.dump(profile, file, indent=2)
+
+    # Profiles may be deleted by a concurrent request meanwhile
+    profile_mtimes = {}
+    with os.scandir(profiles_dir) as entries:
+        for entry in entries:
+            if entry.name.endswith(".json") and entry.path != file_path:
+                try:
+                    profile_mtimes[entry.path] = entry.stat().st_mtime_ns
+                except FileNotFoundError:
+                    pass
+
+    # The saved profile is the newest one
+    newest_first = sorted(profile_mtimes, key=profile_mtimes.get, reverse=True)
+    for old_file_path in newest_first[max(keep or PROFILES_KEEP, 1) - 1 :]:
+        try:
+            os.remove(old_file_path)
+        except FileNotFoundError:
+            pass
+
+    return file_path
+
+
+def finish_profile(sampler: StackSampler, details: dict) -> dict:
+    """
+    Waits for a stopped sampler, summarizes its stacks and saves the profile.
+    Blocks, so it is run in a thread by ProfilingMiddleware.
+
+    Args:
+        sampler (StackSampler): The stopped sampler.
+        details (dict): Details of the request to add to the profile, e.g. "id" and "path".
+
+    Returns:
+        dict: The saved profile.
+    """
+    sampler.join()
+
+    profile = summarize_stacks(sampler.stacks)
+    profile.update(details)
+    save_profile(profile)
+
+    return profile
+
+
+def get_profile(profile_id: str, profiles_dir: str = PROFILES_DIR) -> dict:
+    """
+    Reads a stored request profile.
+
+    Args:
+        profile_id (str): Id of the profile, as returned in the "X-Profile-Id" header.
+        profiles_dir (str): Directory where profiles are stored.
+
+    Returns:
+        dict: The stored profile. If the profile does not exist, an empty dictionary is returned.
+    """
+    # Only accept ids as generated by ProfilingMiddleware to stay inside profiles_dir
+    if not profile_id.replace("-", "").isalnum():
+        return {}
+
+    try:
+        with open(
+            os.path.join(profiles_dir, f"{profile_id}.json"), "r", encoding="utf-8"
+        ) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware profiling single requests on demand.
+
+    A request is profiled if it sends the header "X-Profile: 1" together with an
+    admin session token or admin credentials (see is_admin_request). The top frames
+    are returned in the "X-Profile-Top" header and the full profile is stored in
+    PROFILES_DIR, retrievable via the "X-Profile-Id" header, which keeps the newest
+    PROFILES_KEEP profiles. Other requests are
+    passed through after a single header lookup. Sync endpoints are only sampled
+    if their routes use ProfiledRoute.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or (b"x-profile", b"1") not in scope["headers"]:
+            await self.app(scope, receive, send)
+            return
+
+        headers = {
+            key.decode("latin-1"): value.decode("latin-1")
+            for key, value in scope["headers"]
+        }
+        if not is_admin_request(headers):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        sampler = StackSampler(threading.get_ident(), sys._getframe())
+        start_time = time.perf_counter()
+        sampler.start()
+        sampler_token = _active_sampler.set(sampler)
+
+        async def send_with_profile(message):
+            # Headers are sent before the body, so the profile covers the request up to
+            # the serialized response
+            if message["type"] == "http.response.start":
+                sampler.stop()
+                duration_ms = round((time.perf_counter() - start_time) * 1000, 3)
+
+                profile = await asyncio.to_thread(
+                    finish_profile,
+                    sampler,
+                    {
+                        "id": profile_id,
+                        "path": scope["path"],
+                        "query_string": scope["query_string"].decode("latin-1"),
+                        "duration_ms": duration_ms,
+                    },
+                )
+
+                top = ", ".join(
+                    f"{frame['frame']} {frame['share']:.0%}" for frame in profile["top"]
+                )
+                message = dict(message)
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-profile-id", profile_id.encode("latin-1")),
+                    (b"x-profile-duration-ms", str(duration_ms).encode("latin-1")),
+                    (b"x-profile-top", top.encode("latin-1", errors="replace")),
+                ]
+
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_profile)
+        finally:
+            _active_sampler.reset(sampler_token)
+            sampler.stop()
+
+
 # pandas // DataFrame functions
 
 
@@ -158,6 +643,764 @@ def get_random_questions_df(df, q_c_q):
     return r_q_df
 
 
+# Bank snapshots // cached DataFrame and derived structures per bank version
+
+# Banks are Excel files named "questions_<bank>.xlsx" in BANKS_DIR
+BANKS_DIR = os.environ.get("BANKS_DIR", ".")
+DEFAULT_BANK = "en"
+
+# Memory budget for all resident banks, least recently used banks are evicted beyond it
+BANK_MEMORY_BUDGET_MB = float(os.environ.get("BANK_MEMORY_BUDGET_MB", "256"))
+
+# Bit assigned to each response letter in a "correct" bitmask
+RESPONSE_BITS = {"A": 1, "B": 2, "C": 4, "D": 8}
+
+
+def get_bank_version(file_path: str = "questions_en.xlsx") -> str:
+    """
+    Returns a version string for the question bank, derived from the file's
+    modification time and size. Any save of the Excel file changes the version.
+
+    Args:
+        file_path (str): Path to the Excel file.
+
+    Returns:
+        str: Version string of the question bank.
+    """
+    stat = os.stat(file_path)
+    return f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+
+
+class UnknownBankError(KeyError):
+    """
+    Raised when a bank name is invalid or its Excel file does not exist.
+    """
+
+
+def get_bank_file_path(bank: str) -> str:
+    """
+    Returns the path of a bank's Excel file.
+
+    Args:
+        bank (str): Name of the bank, e.g. "en" for "questions_en.xlsx".
+
+    Returns:
+        str: Path of the Excel file.
+    """
+    # Only plain names, so banks can't point outside BANKS_DIR
+    if not bank or not bank.replace("_", "").replace("-", "").isalnum():
+        raise UnknownBankError(bank)
+
+    return os.path.join(BANKS_DIR, f"questions_{bank}.xlsx")
+
+
+def get_available_banks() -> List[str]:
+    """
+    Returns the names of all banks with an Excel file in BANKS_DIR.
+    """
+    return sorted(
+        file_name[len("questions_") : -len(".xlsx")]
+        for file_name in os.listdir(BANKS_DIR)
+        if file_name.startswith("questions_") and file_name.endswith(".xlsx")
+    )
+
+
+def estimate_snapshot_size(snapshot: dict) -> int:
+    """
+    Estimates the memory used by a snapshot: its DataFrame and all derived
+    structures built so far.
+
+    Args:
+        snapshot (dict): Snapshot returned by get_bank_snapshot.
+
+    Returns:
+        int: Estimated size in bytes.
+    """
+    size = int(snapshot["questions_df"].memory_usage(index=True, deep=True).sum())
+
+    size += sum(array.nbytes for array in snapshot.get("answer_key", {}).values())
+    size += sum(
+        positions.nbytes
+        for group_positions in snapshot.get("group_positions", {}).values()
+        for positions in group_positions.values()
+    )
+    size += sum(len(payload) for payload in snapshot.get("payloads", {}).values())
+    size += sum(len(payload) for payload in snapshot.get("exports", {}).values())
+
+    if "arrow_table" in snapshot:
+        size += snapshot["arrow_table"].nbytes
+
+    return size
+
+
+class BankRegistry:
+    """
+    Keeps the snapshots of several question banks in memory.
+
+    Banks are loaded lazily on first use and reloaded when their Excel file changes.
+    Workbooks are parsed outside the registry lock, so hits on resident banks never
+    wait for a load; concurrent loads of the same bank are done once. When the
+    estimated size of all resident banks exceeds the memory budget, the least
+    recently used banks are evicted (the bank in use stays resident). The budget is
+    checked when a bank is loaded and when derived structures are added to it (see
+    touch). Loads, hits and evictions are counted per bank.
+    """
+
+    def __init__(self, memory_budget_mb: float = BANK_MEMORY_BUDGET_MB):
+        self.memory_budget = int(memory_budget_mb * 1024 * 1024)
+        self.snapshots: "OrderedDict[str, dict]" = OrderedDict()
+        self.sizes: Dict[str, int] = {}
+        self.stats: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+
+    def _get_resident(self, bank: str, version: str) -> Optional[dict]:
+        # Must be called with self._lock held
+        stats = self.stats.setdefault(
+            bank,
+            {"loads": 0, "hits": 0, "evictions": 0, "last_load_ms": None},
+        )
+        snapshot = self.snapshots.get(bank)
+
+        if snapshot is not None and snapshot["version"] == version:
+            stats["hits"] += 1
+            self.snapshots.move_to_end(bank)
+            return snapshot
+
+        return None
+
+    def get(self, bank: str = DEFAULT_BANK) -> dict:
+        """
+        Returns the snapshot of a bank, loading it if it isn't resident or outdated.
+
+        Args:
+            bank (str): Name of the bank.
+
+        Returns:
+            dict: Snapshot of the bank.
+        """
+        file_path = get_bank_file_path(bank)
+
+        try:
+            version = get_bank_version(file_path)
+        except FileNotFoundError:
+            raise UnknownBankError(bank)
+
+        with self._lock:
+            snapshot = self._get_resident(bank, version)
+            if snapshot is not None:
+                return snapshot
+
+            load_lock = self._load_locks.setdefault(bank, threading.Lock())
+
+        with load_lock:
+            # Another thread may have loaded the bank while we waited
+            with self._lock:
+                snapshot = self._get_resident(bank, version)
+                if snapshot is not None:
+                    return snapshot
+
+            start_time = time.perf_counter()
+            snapshot = {
+                "bank": bank,
+                "version": version,
+                "questions_df": get_DataFrame_from_Excel(file_path),
+            }
+            load_ms = round((time.perf_counter() - start_time) * 1000, 3)
+            size = estimate_snapshot_size(snapshot)
+
+            with self._lock:
+                stats = self.stats[bank]
+                stats["loads"] += 1
+                stats["last_load_ms"] = load_ms
+
+                self.snapshots[bank] = snapshot
+                self.snapshots.move_to_end(bank)
+                self.sizes[bank] = size
+                self._evict(keep=bank)
+
+            return snapshot
+
+    def touch(self, snapshot: dict) -> None:
+        """
+        Updates the estimated size of a resident snapshot after derived structures
+        were added to it and evicts other banks if the budget is exceeded.
+
+        Args:
+            snapshot (dict): Snapshot returned by get.
+        """
+        bank = snapshot.get("bank")
+        size = estimate_snapshot_size(snapshot)
+
+        with self._lock:
+            if self.snapshots.get(bank) is snapshot:
+                self.sizes[bank] = size
+                self._evict(keep=bank)
+
+    def _evict(self, keep: str) -> None:
+        # Must be called with self._lock held
+        total_size = sum(self.sizes.values())
+
+        for bank in list(self.snapshots):
+            if total_size <= self.memory_budget:
+                break
+            if bank == keep:
+                continue
+
+            del self.snapshots[bank]
+            total_size -= self.sizes.pop(bank)
+            self.stats[bank]["evictions"] += 1
+
+    def get_stats(self) -> dict:
+        """
+        Returns the memory budget, the estimated memory used and the stats per bank,
+        including banks which have not been loaded yet.
+        """
+        available_banks = get_available_banks()
+
+        with self._lock:
+            banks = {}
+            for bank in sorted(set(available_banks) | set(self.stats)):
+                snapshot = self.snapshots.get(bank)
+                banks[bank] = {
+                    "loads": 0,
+                    "hits": 0,
+                    "evictions": 0,
+                    "last_load_ms": None,
+                    **self.stats.get(bank, {}),
+                    "resident": snapshot is not None,
+                    "version": snapshot["version"] if snapshot else None,
+                    "size_bytes": self.sizes.get(bank, 0),
+                }
+
+            return {
+                "memory_budget_bytes": self.memory_budget,
+                "memory_used_bytes": sum(self.sizes.values()),
+                "banks": banks,
+            }
+
+
+# Registry shared by the FastAPI app and the Streamlit app
+bank_registry = BankRegistry()
+
+
+def get_bank_snapshot(bank: str = DEFAULT_BANK) -> dict:
+    """
+    Returns the cached snapshot of a question bank, re-reading its Excel file
+    only when its version changed.
+
+    A snapshot is a dictionary with the keys "bank", "version" and "questions_df".
+    Structures derived from the DataFrame (e.g. the answer key) are cached in
+    the same dictionary, so they are rebuilt once per bank version as well.
+    The DataFrame is shared between callers and must not be modified in place.
+
+    Args:
+        bank (str): Name of the bank (default is DEFAULT_BANK, i.e. "questions_en.xlsx").
+
+    Returns:
+        dict: Snapshot of the question bank.
+    """
+    return bank_registry.get(bank)
+
+
+def letters_to_bitmasks(letters: pd.Series) -> np.ndarray:
+    """
+    Converts response letters such as "A", "B,C", "A C" or "None" into bitmasks
+    (A=1, B=2, C=4, D=8) using vectorized string operations.
+
+    Args:
+        letters (pd.Series): Series of strings with response letters.
+
+    Returns:
+        np.ndarray: Array of uint8 bitmasks, one per entry of the Series.
+    """
+    letters = letters.fillna("").astype(str)
+    masks = np.zeros(len(letters), dtype=np.uint8)
+
+    for letter, bit in RESPONSE_BITS.items():
+        has_letter = letters.str.contains(rf"\b{letter}\b", regex=True).to_numpy()
+        masks |= has_letter.astype(np.uint8) * np.uint8(bit)
+
+    return masks
+
+
+def get_answer_key(snapshot: dict) -> dict:
+    """
+    Returns the answer key of a bank snapshot, building it on first use.
+
+    Args:
+        snapshot (dict): Snapshot returned by get_bank_snapshot.
+
+    Returns:
+        dict: Dictionary with the sorted question numbers "nr" and the bitmasks
+        of their correct responses "mask" as numpy arrays.
+    """
+    if "answer_key" not in snapshot:
+        questions_df = snapshot["questions_df"].sort_index()
+        snapshot["answer_key"] = {
+            "nr": questions_df.index.to_numpy(dtype=np.int64),
+            "mask": letters_to_bitmasks(questions_df["correct"]),
+        }
+        bank_registry.touch(snapshot)
+
+    return snapshot["answer_key"]
+
+
+def grade_submissions(submissions: list, answer_key: dict) -> dict:
+    """
+    Scores many quiz submissions at once against an answer key.
+
+    Each submission is a dictionary with an optional "id" and a list of
+    "answers", each answer being a dictionary with the question number "nr"
+    and the "selected" letters (string like "A,C" or list like ["A", "C"]).
+    An answer is correct if the selected letters match the correct letters
+    exactly, an answer without "selected" is wrong. Answers to unknown or
+    non-integral question numbers are not scored, neither are answers to questions
+    without any correct letter in the key (counted as ungradable). If a question is
+    answered several times in one submission, only the last answer is scored and
+    the others are counted as duplicates.
+
+    Args:
+        submissions (list): List of submissions.
+        answer_key (dict): Answer key returned by get_answer_key.
+
+    Returns:
+        dict: Dictionary with per-submission "results" and per-question "statistics".
+    """
+    # Flatten all answers into one table: submission position, nr, selected letters
+    sub_positions, nrs, selected, has_selected = [], [], [], []
+    for sub_pos, submission in enumerate(submissions):
+        for answer in submission.get("answers", []):
+            letters = answer.get("selected")
+            if isinstance(letters, list):
+                letters = ",".join(str(letter) for letter in letters)
+            nr = answer.get("nr")
+            sub_positions.append(sub_pos)
+            nrs.append(None if isinstance(nr, bool) else nr)
+            selected.append(letters)
+            has_selected.append(letters is not None)
+
+    sub_positions = np.asarray(sub_positions, dtype=np.int64)
+    has_selected = np.asarray(has_selected, dtype=bool)
+
+    # Only integral question numbers can be known, e.g. 1.7 or 1e30 are unknown
+    nrs = pd.to_numeric(pd.Series(nrs, dtype=object), errors="coerce")
+    nrs = nrs.to_numpy(dtype=float, na_value=np.nan)
+    integral = np.isfinite(nrs) & (np.abs(nrs) < 2**53)
+    integral[integral] = nrs[integral] == np.floor(nrs[integral])
+    nrs = np.where(integral, nrs, -1).astype(np.int64)
+
+    selected_masks = letters_to_bitmasks(pd.Series(selected, dtype=object))
+
+    key_nrs = answer_key["nr"]
+    key_masks = answer_key["mask"]
+    submission_count = len(submissions)
+    question_count = len(key_nrs)
+
+    # Look up each answered nr in the sorted answer key
+    if question_count > 0:
+        positions = np.searchsorted(key_nrs, nrs).clip(max=question_count - 1)
+        known = integral & (key_nrs[positions] == nrs)
+    else:
+        positions = np.zeros(len(nrs), dtype=np.int64)
+        known = np.zeros(len(nrs), dtype=bool)
+
+    # Keep only the last answer per submission and question
+    known_indices = np.flatnonzero(known)
+    pair_keys = sub_positions[known_indices] * question_count + positions[known_indices]
+    _, last_in_reversed = np.unique(pair_keys[::-1], return_index=True)
+    duplicate = known.copy()
+    duplicate[known_indices[len(known_indices) - 1 - last_in_reversed]] = False
+    known &= ~duplicate
+
+    # Questions without a correct letter (e.g. "None") can't be graded
+    if question_count:
+        answer_masks = key_masks[positions]
+        ungradable = known & (answer_masks == 0)
+        known &= ~ungradable
+        correct = known & has_selected & (answer_masks == selected_masks)
+    else:
+        ungradable = np.zeros(len(nrs), dtype=bool)
+        correct = known
+
+    scores = np.bincount(sub_positions[correct], minlength=submission_count)
+    answered = np.bincount(sub_positions[known], minlength=submission_count)
+    unknown = np.bincount(
+        sub_positions[~known & ~duplicate & ~ungradable], minlength=submission_count
+    )
+    duplicates = np.bincount(sub_positions[duplicate], minlength=submission_count)
+    ungradables = np.bincount(sub_positions[ungradable], minlength=submission_count)
+
+    attempts = np.bincount(positions[known], minlength=question_count)
+    correct_counts = np.bincount(positions[correct], minlength=question_count)
+    attempted = np.flatnonzero(attempts)
+
+    results = [
+        {
+            "id": submission.get("id", sub_pos),
+            "score": score,
+            "answered": answered_count,
+            "unknown": unknown_count,
+            "duplicates": duplicate_count,
+            "ungradable": ungradable_count,
+        }
+        for sub_pos, (
+            submission,
+            score,
+            answered_count,
+            unknown_count,
+            duplicate_count,
+            ungradable_count,
+        ) in enumerate(
+            zip(
+                submissions,
+                scores.tolist(),
+                answered.tolist(),
+                unknown.tolist(),
+                duplicates.tolist(),
+                ungradables.tolist(),
+            )
+        )
+    ]
+
+    statistics = [
+        {
+            "nr": nr,
+            "attempts": attempt_count,
+            "correct": correct_count,
+            "correct_rate": round(correct_count / attempt_count, 4),
+        }
+        for nr, attempt_count, correct_count in zip(
+            key_nrs[attempted].tolist(),
+            attempts[attempted].tolist(),
+            correct_counts[attempted].tolist(),
+        )
+    ]
+
+    return {"results": results, "statistics": statistics}
+
+
+def get_group_positions(snapshot: dict, col_name: str) -> Dict[str, np.ndarray]:
+    """
+    Returns the row positions of each unique value of a column of a bank
+    snapshot, building them on first use.
+
+    Args:
+        snapshot (dict): Snapshot returned by get_bank_snapshot.
+        col_name (str): Name of the column to group by (e.g. "subject" or "use").
+
+    Returns:
+        Dict[str, np.ndarray]: Dictionary mapping each value to its sorted row positions.
+    """
+    group_positions = snapshot.setdefault("group_positions", {})
+
+    if col_name not in group_positions:
+        group_positions[col_name] = {
+            value: np.asarray(positions, dtype=np.int64)
+            for value, positions in snapshot["questions_df"]
+            .groupby(col_name, sort=True)
+            .indices.items()
+        }
+        bank_registry.touch(snapshot)
+
+    return group_positions[col_name]
+
+
+def allocate_quotas(
+    sizes: np.ndarray, shares: np.ndarray, total: int, rng: np.random.Generator
+) -> np.ndarray:
+    """
+    Splits a total number of questions into quotas per group according to shares.
+
+    Rounding leftovers go to the groups with the largest remainders. If the total
+    fits into the groups, no quota exceeds its group size and the shortfall of small
+    groups is redistributed among the groups with spare questions. Otherwise quotas
+    follow the shares and groups are resampled.
+
+    Args:
+        sizes (np.ndarray): Number of available questions per group.
+        shares (np.ndarray): Relative share per group (e.g. 1 for equal, size for proportional).
+        total (int): Total number of questions to allocate.
+        rng (np.random.Generator): Random generator used to break ties.
+
+    Returns:
+        np.ndarray: Quota per group.
+    """
+    capped = total <= sizes[shares > 0].sum()
+    quotas = np.zeros(len(sizes), dtype=np.int64)
+    active = (shares > 0) & (sizes > 0)
+    remaining = total
+
+    while remaining > 0 and active.any():
+        active_shares = shares[active].astype(float)
+        raw = remaining * active_shares / active_shares.sum()
+        additions = np.floor(raw).astype(np.int64)
+
+        # Largest remainder first, random order among ties
+        leftover = remaining - additions.sum()
+        remainders = raw - additions + rng.random(len(raw)) * 1e-9
+        additions[np.argsort(-remainders)[:leftover]] += 1
+
+        if capped:
+            additions = np.minimum(additions, sizes[active] - quotas[active])
+
+        quotas[active] += additions
+        remaining -= additions.sum()
+
+        if capped:
+            active &= quotas < sizes
+
+    return quotas
+
+
+def get_stratified_questions_df(
+    snapshot: dict,
+    subjects: List[str],
+    use: str,
+    question_count: str,
+    allocation: str = "equal",
+    weights: Dict[str, float] = None,
+) -> pd.DataFrame:
+    """
+    Draws random questions per subject in a single pass over precomputed row positions.
+
+    Args:
+        snapshot (dict): Snapshot returned by get_bank_snapshot.
+        subjects (List[str]): Subjects to draw from, duplicates are ignored.
+        use (str): The test type to filter questions by ("All" for no filter).
+        question_count (str): The number of random questions to return ("All" for every match).
+        allocation (str): "equal" for the same quota per subject, "proportional"
+            for quotas relative to the available questions per subject.
+        weights (Dict[str, float]): Optional weight per subject, overrides allocation.
+
+    Returns:
+        pd.DataFrame: Shuffled DataFrame with the drawn questions.
+    """
+    rng = np.random.default_rng()
+    subject_positions = get_group_positions(snapshot, "subject")
+    empty = np.empty(0, dtype=np.int64)
+
+    # A subject listed twice would be drawn twice from the same rows
+    subjects = list(dict.fromkeys(subjects))
+
+    groups = [subject_positions.get(subject, empty) for subject in subjects]
+    if use != "All":
+        use_positions = get_group_positions(snapshot, "use").get(use, empty)
+        groups = [
+            np.intersect1d(positions, use_positions, assume_unique=True)
+            for positions in groups
+        ]
+
+    sizes = np.array([len(positions) for positions in groups], dtype=np.int64)
+
+    if weights:
+        shares = np.array([weights.get(subject, 0.0) for subject in subjects])
+    elif allocation == "proportional":
+        shares = sizes.astype(float)
+    else:
+        shares = np.ones(len(subjects))
+
+    if question_count == "All":
+        quotas = np.where(shares > 0, sizes, 0)
+    else:
+        quotas = allocate_quotas(sizes, shares, int(question_count), rng)
+
+    drawn = [
+        rng.choice(positions, quota, replace=quota > len(positions))
+        for positions, quota in zip(groups, quotas)
+        if quota > 0
+    ]
+    drawn = np.concatenate(drawn) if drawn else empty
+
+    return snapshot["questions_df"].iloc[rng.permutation(drawn)]
+
+
+def get_serialized_payload(snapshot: dict, payload_name: str) -> bytes:
+    """
+    Returns a pre-serialized JSON payload of a bank snapshot, building it on first use.
+
+    Available payloads are "questions" (all questions, as returned by the
+    "questions" route without filters), "categories" and "test_types".
+
+    Args:
+        snapshot (dict): Snapshot returned by get_bank_snapshot.
+        payload_name (str): Name of the payload.
+
+    Returns:
+        bytes: UTF-8 encoded JSON payload.
+    """
+    payloads = snapshot.setdefault("payloads", {})
+
+    if payload_name not in payloads:
+        questions_df = snapshot["questions_df"]
+
+        if payload_name == "questions":
+            content = {"questions": questions_df.to_dict(orient="records")}
+        elif payload_name == "categories":
+            content = get_unique_col_values(questions_df, "subject")
+        elif payload_name == "test_types":
+            content = get_unique_col_values(questions_df, "use")
+        else:
+            raise KeyError(f"Unknown payload: {payload_name}")
+
+        # Same JSON format as FastAPI's JSONResponse
+        payloads[payload_name] = json.dumps(
+            content, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+        ).encode("utf-8")
+        bank_registry.touch(snapshot)
+
+    return payloads[payload_name]
+
+
+# Media type and file extension per export format
+EXPORT_FORMATS = {
+    "arrow": ("application/vnd.apache.arrow.stream", "arrow"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "csv": ("text/csv", "csv"),
+}
+
+
+def get_arrow_table(snapshot: dict):
+    """
+    Returns the questions of a bank snapshot as Arrow table with the column "nr"
+    followed by all question columns as strings, building it on first use.
+
+    Requires the optional dependency pyarrow.
+
+    Args:
+        snapshot (dict): Snapshot returned by get_bank_snapshot.
+
+    Returns:
+        pyarrow.Table: Table with all questions.
+    """
+    import pyarrow as pa
+
+    if "arrow_table" not in snapshot:
+        questions_df = snapshot["questions_df"]
+
+        # Cells may hold booleans or numbers (e.g. TRUE in Excel), export all as strings
+        columns = {"nr": pa.array(questions_df.index.to_numpy(dtype=np.int64))}
+        for col_name in questions_df.columns:
+            columns[col_name] = pa.array(
+                questions_df[col_name].astype("string"),
+                type=pa.string(),
+                from_pandas=True,
+            )
+
+        snapshot["arrow_table"] = pa.table(columns)
+        bank_registry.touch(snapshot)
+
+    return snapshot["arrow_table"]
+
+
+def get_filtered_positions(snapshot: dict, use: str = "All", subject: str = "All"):
+    """
+    Returns the sorted row positions of the questions matching test type and categories.
+
+    Args:
+        snapshot (dict): Snapshot returned by get_bank_snapshot.
+        use (str): The test type to filter by ("All" for no filter).
+        subject (str): Comma-separated categories to filter by ("All" for no filter).
+
+    Returns:
+        np.ndarray: Row positions, or None if no filter is applied.
+    """
+    if use == "All" and subject == "All":
+        return None
+
+    empty = np.empty(0, dtype=np.int64)
+    positions = np.arange(len(snapshot["questions_df"]), dtype=np.int64)
+
+    if use != "All":
+        positions = get_group_positions(snapshot, "use").get(use, empty)
+
+    if subject != "All":
+        subject_positions = get_group_positions(snapshot, "subject")
+        positions = np.intersect1d(
+            positions,
+            np.concatenate(
+                [subject_positions.get(value, empty) for value in subject.split(",")]
+            ),
+        )
+
+    return positions
+
+
+def get_export_payload(
+    snapshot: dict, export_format: str, use: str = "All", subject: str = "All"
+) -> bytes:
+    """
+    Serializes the questions of a bank snapshot, optionally filtered, from its
+    Arrow table as Arrow IPC stream, Parquet or CSV. The unfiltered payloads are
+    cached in the snapshot.
+
+    Requires the optional dependency pyarrow.
+
+    Args:
+        snapshot (dict): Snapshot returned by get_bank_snapshot.
+        export_format (str): "arrow", "parquet" or "csv".
+        use (str): The test type to filter by ("All" for no filter).
+        subject (str): Comma-separated categories to filter by ("All" for no filter).
+
+    Returns:
+        bytes: The serialized questions.
+    """
+    import pyarrow as pa
+    import pyarrow.csv
+    import pyarrow.parquet
+
+    positions = get_filtered_positions(snapshot, use, subject)
+    exports = snapshot.setdefault("exports", {})
+
+    if positions is None and export_format in exports:
+        return exports[export_format]
+
+    table = get_arrow_table(snapshot)
+    if positions is not None:
+        table = table.take(pa.array(positions))
+
+    sink = io.BytesIO()
+    if export_format == "arrow":
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+    elif export_format == "parquet":
+        pyarrow.parquet.write_table(table, sink)
+    elif export_format == "csv":
+        pyarrow.csv.write_csv(table, sink)
+    else:
+        raise KeyError(f"Unknown export format: {export_format}")
+
+    payload = sink.getvalue()
+    if positions is None:
+        exports[export_format] = payload
+        bank_registry.touch(snapshot)
+
+    return payload
+
+
+def warm_up_bank(bank: str = DEFAULT_BANK) -> dict:
+    """
+    Loads the question bank and builds all derived structures of its snapshot,
+    so the first requests don't pay for them.
+
+    Args:
+        bank (str): Name of the bank.
+
+    Returns:
+        dict: The warmed-up snapshot.
+    """
+    snapshot = get_bank_snapshot(bank)
+
+    get_answer_key(snapshot)
+    get_group_positions(snapshot, "subject")
+    get_group_positions(snapshot, "use")
+
+    for payload_name in ("questions", "categories", "test_types"):
+        get_serialized_payload(snapshot, payload_name)
+
+    return snapshot
+
+
 # Define the callback function that will run when any response changes
 def update_correct_box_options():
     """
@@ -234,7 +1477,7 @@ def json_to_df(json_string: dict) -> pd.DataFrame:
 
 def get_all_questions_df(new_question_dict: dict) -> pd.DataFrame:
 
-    questions_df = get_DataFrame_from_Excel()
+    questions_df = get_bank_snapshot()["questions_df"]
     new_question_df = json_to_df(new_question_dict)
 
     # Ensure new_question_df has the same columns as questions_df
@@ -247,6 +1490,46 @@ def get_all_questions_df(new_question_dict: dict) -> pd.DataFrame:
     return all_questions_df
 
 
+def get_questions_preview_df(
+    snapshot: dict, new_question_dict: dict, page: int = 1, page_size: int = 25
+) -> pd.DataFrame:
+    """
+    Returns one page of all questions including the new question, sorted by
+    descending "nr" like get_all_questions_df, without concatenating and
+    sorting the whole DataFrame.
+
+    Args:
+        snapshot (dict): Snapshot returned by get_bank_snapshot.
+        new_question_dict (dict): Dictionary with the new question under "new_question".
+        page (int): Page number, starting at 1.
+        page_size (int): Number of questions per page.
+
+    Returns:
+        pd.DataFrame: DataFrame with the questions of the requested page.
+    """
+    questions_df = snapshot["questions_df"]
+    new_question_df = json_to_df(new_question_dict)[questions_df.columns.tolist()]
+
+    start = (page - 1) * page_size
+    stop = start + page_size
+
+    if questions_df.empty or new_question_df.index.min() <= questions_df.index.max():
+        # New question doesn't go on top, fall back to the full sort
+        all_questions_df = pd.concat([questions_df, new_question_df])
+        return all_questions_df.sort_values(by="nr", ascending=False).iloc[start:stop]
+
+    # New questions come first, followed by the bank in reverse order
+    new_count = len(new_question_df)
+    page_parts = [
+        new_question_df.sort_index(ascending=False).iloc[start:stop],
+        questions_df.iloc[::-1].iloc[
+            max(start - new_count, 0) : max(stop - new_count, 0)
+        ],
+    ]
+
+    return pd.concat([part for part in page_parts if not part.empty] or page_parts[:1])
+
+
 def save_all_questions_df(
     df: pd.DataFrame, file_path: str = "questions_en.xlsx"
 ) -> None: